@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    线程安全的进程内 LRU 缓存，每个条目可以有自己的过期时间。
+    超出 maxsize 时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            deadline, value = item
+            if deadline <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            return
+        deadline = time.monotonic() + ttl if ttl is not None else float("inf")
+        with self._lock:
+            self._data[key] = (deadline, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[1]
+
+    def pop_matching(self, predicate: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            keys = [k for k in self._data if predicate(k)]
+            for k in keys:
+                del self._data[k]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+class ReadThroughCache:
+    """
+    在 TTLCache 之上的异步读穿缓存：
+    - 同一个 key 并发未命中时只执行一次 loader，其余请求等待同一结果；
+    - invalidate 会让正在进行中的加载结果作废，避免把失效前读到的旧数据写回缓存；
+    - loader 返回 None（如记录不存在）时不缓存。
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self._cache = TTLCache(maxsize, ttl)
+        self._inflight: Dict[Hashable, "asyncio.Future"] = {}
+        # 加载期间被失效的 key，只在加载进行中保留，大小不超过 _inflight
+        self._stale: Set[Hashable] = set()
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = self._cache.get(key)
+        if value is not None:
+            return value
+        pending = self._inflight.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # 发起加载的请求被取消（如客户端断开）时，由当前请求自己重新加载
+                if not pending.cancelled():
+                    raise
+                return await self.get(key, loader)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 标记为已读取，没有等待者时不告警
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            stale = key in self._stale
+            self._stale.discard(key)
+        if value is not None and not stale:
+            self._cache.set(key, value)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key: Hashable):
+        if key in self._inflight:
+            self._stale.add(key)
+        self._cache.pop(key)
+
+    def clear(self):
+        self._stale.update(self._inflight)
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
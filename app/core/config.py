@@ -1,6 +1,6 @@
 from typing import List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import field_validator
+from pydantic import field_validator, model_validator
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
@@ -9,11 +9,22 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 class Settings(BaseSettings):
     # --- Database ---
     DATABASE_URL: str = "sqlite:///./dev.db"
+    ASYNC_DATABASE_URL: Optional[str] = None  # 为空时由 DATABASE_URL 推导（pymysql -> aiomysql, sqlite -> aiosqlite）
 
     # --- Security ---
     SECURITY_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    AUTH_STATELESS: bool = True  # 身份取自 access token，只按 uid 查询并缓存令牌版本与管理员标记，不再逐请求加载 User
+    TOKEN_CACHE_SIZE: int = 4096  # 已验证令牌的缓存条目数，0 表示关闭
+    # 无状态鉴权时按 uid 缓存 users.tokenVersion/isAdmin 的条目数，0 表示关闭（每个请求都查询）；
+    # 缓存时间即其它 worker 吊销令牌、变更管理员权限生效的最大延迟
+    TOKEN_VERSION_CACHE_SIZE: int = 4096
+    TOKEN_VERSION_CACHE_TTL_SECONDS: float = 10
+
+    # --- Password Hashing ---
+    PASSWORD_HASH_WORKERS: int = 2          # bcrypt 进程池大小
+    PASSWORD_HASH_MAX_PENDING: int = 64     # 排队 + 执行中的任务上限，超出直接 503
 
     # --- Mail ---
     MAIL_USERNAME: Optional[str] = None
@@ -25,14 +36,110 @@ class Settings(BaseSettings):
     MAIL_STARTTLS: bool = False
     MAIL_SSL_TLS: bool = True
 
+    MAIL_TIMEOUT_SECONDS: float = 30
+
+    # --- Mail Queue ---
+    MAIL_QUEUE_ENABLED: bool = True  # 关闭后本 worker 不发信，邮件留在 mail_queue 中
+    MAIL_BATCH_SIZE: int = 20  # 每次认领并复用同一 SMTP 连接发送的邮件数
+    MAIL_POLL_INTERVAL_SECONDS: float = 2.0
+    MAIL_CLAIM_LEASE_SECONDS: int = 120  # 认领后未完成（如 worker 重启）的邮件在租约到期后重新发送
+    MAIL_MAX_ATTEMPTS: int = 5
+    MAIL_RETRY_BASE_SECONDS: float = 10  # 指数退避：base * 2^(attempts-1)，带抖动
+    MAIL_RETRY_MAX_SECONDS: float = 600
+    MAIL_RETENTION_DAYS: int = 7  # 已发送 / 最终失败的邮件保留天数，由发信循环定期删除
+    MAIL_PURGE_INTERVAL_SECONDS: int = 3600
+
+    # --- Redis ---
+    REDIS_URL: Optional[str] = None  # 多 worker 共享状态（限流等）；fakeredis:// 为进程内替身
+
+    # --- Rate Limiting ---
+    RATE_LIMIT_BACKEND: str = "memory"  # memory: 单进程；redis: 基于 REDIS_URL 在 worker 间共享；none: 关闭
+    RATE_LIMIT_MEMORY_SIZE: int = 100_000  # memory 后端最多保留的桶数
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # 位于反向代理之后时按 X-Forwarded-For 取客户端 IP
+    # 令牌桶规则 "容量/秒数"：最多突发「容量」次，之后每「秒数/容量」秒恢复一次
+    RATE_LIMIT_LOGIN_IP: str = "30/60"
+    RATE_LIMIT_LOGIN_ACCOUNT: str = "5/60"
+    RATE_LIMIT_SEND_CODE_IP: str = "10/600"
+    RATE_LIMIT_SEND_CODE_EMAIL: str = "3/600"
+    RATE_LIMIT_RESET_IP: str = "10/600"
+    RATE_LIMIT_RESET_EMAIL: str = "5/600"
+
     # --- Verification Code ---
     VERIFICATION_CODE_EXPIRE_MINUTES: int = 5
     VERIFICATION_CODE_MIN_INTERVAL_SECONDS: int = 60
+    # sql: verification_codes 表（定期清理过期行）；redis: 基于 REDIS_URL，多 worker 共享；memory: 仅单进程开发使用
+    VERIFICATION_CODE_BACKEND: str = "sql"
+    VERIFICATION_CODE_PURGE_INTERVAL_SECONDS: int = 600
 
     # --- Uploads ---
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024
     UPLOAD_DIR: str = str(PROJECT_ROOT / "uploads")
     PUBLIC_BASE_URL: str = ""
+    # app: 由本服务的 /static 提供；accel: /static 只做校验，经 X-Accel-Redirect 交给前置代理发送；
+    # external: PUBLIC_BASE_URL 直接指向上传目录（由外部静态服务器提供）。
+    # 未配置时沿用旧行为：设置了 PUBLIC_BASE_URL 为 external，否则为 app
+    STATIC_SERVE_MODE: Optional[str] = None
+    STATIC_ACCEL_PREFIX: str = "/_uploads/"
+    # 设置后，上传超过该时间仍未被项目/报名认领的附件会被定期清理；默认不清理。
+    # 只处理内容寻址上传（sha256 非空）的附件，头像以 avatarUrl 与附件 url 完全相同来识别
+    UPLOAD_UNCLAIMED_TTL_HOURS: Optional[int] = None
+    UPLOAD_SWEEP_INTERVAL_SECONDS: int = 3600
+
+    # --- Thumbnails ---
+    THUMBNAIL_ENABLED: bool = True
+    THUMBNAIL_WORKERS: int = 1
+    THUMBNAIL_MAX_SIZE: int = 320  # 缩略图最长边（像素）
+
+    # --- Project Cache ---
+    PROJECT_CACHE_SIZE: int = 1024  # 项目详情 / 我的项目 已序列化响应的缓存条目数
+    PROJECT_CACHE_TTL_SECONDS: float = 30  # 每个 worker 独立缓存，其他 worker 的修改最多延迟该时间可见
+
+    # --- Counts ---
+    COUNT_CACHE_TTL_SECONDS: int = 30
+    COUNT_ESTIMATE_ENABLED: bool = False  # 无过滤的大表总数改用 information_schema 估算（仅 MySQL）
+    COUNT_ESTIMATE_MIN_ROWS: int = 100_000  # 估算值低于该阈值时仍做精确计数
+
+    # --- UID ---
+    UID_BLOCK_SIZE: int = 64  # 每个 worker 一次从序列预留的号段长度
+    UID_PERMUTATION_KEY: str = ""  # 序号 -> UID 置换的密钥，为空时使用 SECURITY_KEY；投入使用后不可更改
+
+    # --- Stats ---
+    # 计数器自动对账周期（需扫描业务表）；0 表示不自动对账，只通过 POST /admin/stats/reconcile 执行。
+    # 大于 0 时各 worker 每个周期竞争一次租约（有 REDIS_URL 时用 redis，否则用 stats_counters 中的租约行），同一周期只有一个进程执行
+    STATS_RECONCILE_INTERVAL_SECONDS: int = 0
+    STATS_DAILY_DAYS: int = 30  # /admin/stats 默认返回的按天直方图天数
+
+    # --- Registrations ---
+    BULK_AUDIT_CHUNK_SIZE: int = 500
+    REGISTRATION_STATUS_CACHE_SIZE: int = 10000
+    # 同进程内的修改会立即失效；TTL 兜底其它 worker 的修改及缩略图等后台回写
+    REGISTRATION_STATUS_CACHE_TTL_SECONDS: int = 30
+    REGISTRATION_STATUS_MAX_WAIT_SECONDS: int = 30  # /registration/status?wait= 长轮询的上限
+
+    # --- Events ---
+    EVENTS_BACKEND: str = "memory"  # memory: 仅单 worker；redis: 基于 REDIS_URL 在 worker 间广播
+    EVENTS_HEARTBEAT_SECONDS: int = 15  # SSE 空闲时的心跳间隔，防止代理断开空闲连接
+    EVENTS_QUEUE_SIZE: int = 64  # 单个连接未发送的事件上限，超出则断开，由客户端续传
+    EVENTS_HISTORY_SIZE: int = 50  # 每个用户保留用于 Last-Event-ID 续传的事件数
+    EVENTS_HISTORY_TTL_SECONDS: int = 3600
+    # EventSource 无法设置请求头，改用 POST /registration/events/ticket 换取的短期票据放在 URL 中
+    EVENTS_TICKET_TTL_SECONDS: int = 60
+
+    # --- Exports ---
+    EXPORT_BATCH_SIZE: int = 1000  # 服务端游标每批读取行数，也是流式输出的分块行数
+
+    # --- Metrics ---
+    # /metrics 与 Server-Timing 会暴露路由清单和各阶段耗时，默认关闭；对外部署开启时请同时设置 METRICS_TOKEN
+    METRICS_ENABLED: bool = False
+    METRICS_TOKEN: Optional[str] = None  # 设置后 /metrics 需携带 Authorization: Bearer <token>
+    METRICS_SERVER_TIMING: bool = True  # 响应头附带 Server-Timing（app/db/bcrypt/serialize 耗时）
+
+    # --- Query Trace ---
+    # 开发/预发环境使用：按请求归组 SQL，报告 N+1 与慢查询（含路由与调用位置）
+    QUERY_TRACE_ENABLED: bool = False
+    QUERY_TRACE_STRICT: bool = False  # 发现问题时抛出 QueryTraceError，供本地测试直接失败
+    QUERY_TRACE_N_PLUS_ONE: int = 5  # 同一语句在一个请求内以不同参数执行达到该次数视为 N+1
+    QUERY_TRACE_SLOW_MS: int = 200
 
     # --- CORS ---
     ALLOWED_ORIGINS: List[str] = ["*"]
@@ -66,6 +173,12 @@ class Settings(BaseSettings):
             return [i.strip() for i in s.split(",") if i.strip()]
         return v
 
+    @model_validator(mode="after")
+    def _default_static_serve_mode(self):
+        if self.STATIC_SERVE_MODE is None:
+            self.STATIC_SERVE_MODE = "external" if self.PUBLIC_BASE_URL else "app"
+        return self
+
     model_config = SettingsConfigDict(
         env_file=".env.mysql",
         case_sensitive=True,
@@ -0,0 +1,100 @@
+"""
+本地调试用的 SMTP 服务器：接受任意账号登录，收到的邮件打印到终端并保存在 messages 中，不做任何投递。
+
+    python -m app.core.debug_smtp --port 1025
+
+然后设置 MAIL_SERVER=127.0.0.1 MAIL_PORT=1025 MAIL_SSL_TLS=false MAIL_STARTTLS=false。
+"""
+import argparse
+import asyncio
+from email import message_from_bytes, policy
+from email.message import EmailMessage
+from typing import List
+
+
+class DebugSmtpServer:
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 1025, echo: bool = True):
+        self.host = host
+        self.port = port
+        self.echo = echo
+        self.messages: List[EmailMessage] = []
+        self.connections = 0
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # port=0 时取实际监听端口
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+
+        async def reply(line: str):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        await reply("220 debug-smtp ready")
+        try:
+            while line := await reader.readline():
+                command = line.decode(errors="replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+                if verb == "EHLO":
+                    await reply("250-debug-smtp")
+                    await reply("250-AUTH PLAIN")
+                    await reply("250 8BITMIME")
+                elif verb == "HELO":
+                    await reply("250 debug-smtp")
+                elif verb == "AUTH":
+                    await reply("235 2.7.0 Authentication successful")
+                elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    self._receive(await self._read_data(reader))
+                    await reply("250 OK: queued")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_data(reader: asyncio.StreamReader) -> bytes:
+        lines = []
+        while (line := await reader.readline()) not in (b".\r\n", b".\n", b""):
+            lines.append(line[1:] if line.startswith(b"..") else line)
+        return b"".join(lines)
+
+    def _receive(self, data: bytes):
+        msg = message_from_bytes(data, policy=policy.default)
+        self.messages.append(msg)
+        if self.echo:
+            print(f"---------- {msg['To']}: {msg['Subject']} ----------")
+            print(msg.get_body().get_content().strip())
+
+
+async def _main(host: str, port: int):
+    server = DebugSmtpServer(host, port)
+    await server.start()
+    print(f"debug SMTP server listening on {server.host}:{server.port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地调试 SMTP 服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_main(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException, status
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.security import hash_password, verify_password
+
+# bcrypt 是纯 CPU 计算，放在独立进程池中执行，避免占满 anyio 线程池并绕开 GIL
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=max(1, settings.PASSWORD_HASH_WORKERS))
+    return _executor
+
+
+async def _submit(fn, *args):
+    global _pending
+    with _pending_lock:
+        if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="服务繁忙，请稍后重试")
+        _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        with metrics.timed("bcrypt"):
+            return await loop.run_in_executor(_get_executor(), fn, *args)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+async def hash_password_async(raw: str) -> str:
+    return await _submit(hash_password, raw)
+
+
+async def verify_password_async(raw: str, hashed: str | None) -> bool:
+    if not hashed:
+        return False
+    return await _submit(verify_password, raw, hashed)
+
+
+def pending_count() -> int:
+    return _pending
+
+
+metrics.sample("password_hash_pending", "排队与执行中的 bcrypt 任务数（达到 PASSWORD_HASH_MAX_PENDING 后返回 503）", pending_count)
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -1,38 +1,82 @@
-import os
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
-from app.core.config import settings
+import asyncio
 import logging
+from email.message import EmailMessage
+from email.utils import formataddr
 
+import aiosmtplib
 
-def _get_mail_conf() -> ConnectionConfig:
+from app.core.config import settings
 
-    return ConnectionConfig(
-        MAIL_USERNAME=settings.MAIL_USERNAME,
-        MAIL_PASSWORD=settings.MAIL_PASSWORD,
-        MAIL_FROM=settings.MAIL_FROM,
-        MAIL_FROM_NAME=settings.MAIL_FROM_NAME,
-        MAIL_PORT=settings.MAIL_PORT,
-        MAIL_SERVER=settings.MAIL_SERVER,
-        MAIL_STARTTLS=settings.MAIL_STARTTLS,
-        MAIL_SSL_TLS=settings.MAIL_SSL_TLS,
-        USE_CREDENTIALS=bool(settings.MAIL_USERNAME),
-        VALIDATE_CERTS=False
-    )
+logger = logging.getLogger(__name__)
 
 
-logger = logging.getLogger(__name__)
+def verification_code_mail(code: str) -> tuple[str, str]:
+    """验证码邮件的 (subject, body)。"""
+    return "Your verification code", f"Your code: {code}"
+
+
+def build_message(recipient: str, subject: str, body: str, subtype: str = "plain") -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM or ""))
+    msg["To"] = recipient
+    msg["Subject"] = subject
+    msg.set_content(body, subtype=subtype)
+    return msg
+
 
+def is_permanent_error(e: Exception) -> bool:
+    # 收件人被拒或服务器返回 5xx：重试没有意义
+    if isinstance(e, aiosmtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(e, aiosmtplib.SMTPResponseException) and e.code >= 500
 
-async def send_verification_code(email: str, code: str):
-    try:
-        fm = FastMail(_get_mail_conf())
-        message = MessageSchema(
-            subject="Your verification code",
-            recipients=[email],
-            body=f"Your code: {code}",
-            subtype="plain",
+
+def is_connection_error(e: Exception) -> bool:
+    return isinstance(e, (aiosmtplib.SMTPConnectError, aiosmtplib.SMTPTimeoutError, ConnectionError, TimeoutError))
+
+
+class SmtpConnection:
+    """
+    每个 worker 复用一条 SMTP(TLS) 长连接；连接断开时自动重连并重发一次。
+    """
+
+    def __init__(self):
+        self._smtp: aiosmtplib.SMTP | None = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.MAIL_SERVER,
+            port=settings.MAIL_PORT,
+            use_tls=settings.MAIL_SSL_TLS,
+            start_tls=False if settings.MAIL_SSL_TLS else settings.MAIL_STARTTLS,
+            validate_certs=False,
+            timeout=settings.MAIL_TIMEOUT_SECONDS,
         )
-        await fm.send_message(message)
-    except Exception as e:
-        logger.exception("send_verification_code failed: %s", e)
+        await smtp.connect()
+        if settings.MAIL_USERNAME:
+            await smtp.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD or "")
+        return smtp
+
+    async def send(self, message: EmailMessage):
+        async with self._lock:
+            for attempt in range(2):
+                if self._smtp is None or not self._smtp.is_connected:
+                    self._smtp = await self._connect()
+                try:
+                    await self._smtp.send_message(message)
+                    return
+                except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, ConnectionError):
+                    # 服务器关闭了空闲连接：丢弃后重连一次
+                    self._smtp = None
+                    if attempt:
+                        raise
 
+    async def close(self):
+        async with self._lock:
+            if self._smtp is not None and self._smtp.is_connected:
+                try:
+                    await self._smtp.quit()
+                except Exception as e:
+                    logger.debug("smtp quit failed: %s", e)
+            self._smtp = None
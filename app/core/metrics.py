@@ -0,0 +1,213 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# 请求内各阶段的耗时：阶段 -> [秒, 次数]
+PHASES = ("db", "bcrypt", "serialize")
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {p: [0.0, 0] for p in PHASES}
+
+    def add(self, phase: str, seconds: float):
+        # 同一请求的查询可能分散在多个线程池线程中执行，列表元素的 += 在 GIL 下足够
+        slot = self.phases.setdefault(phase, [0.0, 0])
+        slot[0] += seconds
+        slot[1] += 1
+
+    def server_timing(self) -> str:
+        total = (time.perf_counter() - self.started) * 1000
+        parts = [f"app;dur={total:.1f}"]
+        for phase, (seconds, count) in self.phases.items():
+            if count:
+                desc = f';desc="{count} queries"' if phase == "db" else ""
+                parts.append(f"{phase};dur={seconds * 1000:.1f}{desc}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def record(phase: str, seconds: float):
+    timings = _current.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+@contextmanager
+def timed(phase: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start)
+
+
+class Histogram:
+    """Prometheus 风格的累积直方图（按标签分组），进程内线程安全。"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets: Iterable[float]):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        for label_values, counts, total, count in sorted(items):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            sep = "," if base else ""
+            for bound, c in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{_fmt(bound)}"}} {c}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+class Sampled:
+    """抓取时才读取当前值的单值指标（gauge / counter），用于暴露各模块已有的计数。"""
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float], kind: str):
+        self.name = name
+        self.help = help_text
+        self.read = read
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", f"{self.name} {self.read()}"]
+
+
+_sampled: Dict[str, Sampled] = {}
+
+
+def sample(name: str, help_text: str, read: Callable[[], float], kind: str = "gauge"):
+    _sampled[name] = Sampled(name, help_text, read, kind)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(bound: float) -> str:
+    return str(int(bound)) if float(bound).is_integer() else str(bound)
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时（到响应体发送完毕）",
+    ("method", "route", "status"), LATENCY_BUCKETS,
+)
+phase_duration = Histogram(
+    "http_request_phase_seconds", "单个请求内各阶段（db/bcrypt/serialize）累计耗时",
+    ("route", "phase"), LATENCY_BUCKETS,
+)
+db_queries = Histogram(
+    "http_request_db_queries", "单个请求执行的 SQL 语句数",
+    ("route",), QUERY_BUCKETS,
+)
+
+
+def _route_template(scope) -> str:
+    # 路由匹配后 FastAPI 会把 APIRoute 写入 scope；用模板路径作标签，避免 /project/123 这类高基数
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    纯 ASGI 中间件（不包裹 StreamingResponse、不打断 contextvars）：
+    为每个 HTTP 请求建立 RequestTimings，响应头附带 Server-Timing，结束后写入各直方图。
+    """
+
+    def __init__(self, app, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = _route_template(scope)
+            request_duration.observe(time.perf_counter() - timings.started, scope["method"], route, str(status_code))
+            for phase, (seconds, count) in timings.phases.items():
+                if count:
+                    phase_duration.observe(seconds, route, phase)
+            db_queries.observe(timings.phases["db"][1], route)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("metrics_query_start")
+    if stack:
+        record("db", time.perf_counter() - stack.pop())
+
+
+def _handle_error(context):
+    # 执行失败时不会触发 after_cursor_execute，同样计入并出栈
+    conn = context.connection
+    stack = conn.info.get("metrics_query_start") if conn is not None else None
+    if stack:
+        record("db", time.perf_counter() - stack.pop())
+
+
+def instrument_engine(engine):
+    """在同步 Engine（异步引擎传 async_engine.sync_engine）上统计每个请求的 SQL 次数与耗时。"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for histogram in (request_duration, phase_duration, db_queries):
+        lines.extend(histogram.render())
+    for sampled in _sampled.values():
+        lines.extend(sampled.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,200 @@
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import event
+
+try:
+    import greenlet
+except ImportError:  # 未安装 greenlet 时异步会话的调用位置只能回溯到当前栈
+    greenlet = None
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_THIS_FILE = os.path.abspath(__file__)
+
+_WS = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+# IN (?, ?, ?) / IN (%s, %s) / 展开后的 POSTCOMPILE 参数个数不同也视为同一语句
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,?)+\)", re.IGNORECASE)
+
+
+class QueryTraceError(AssertionError):
+    """严格模式下发现 N+1 或慢查询时抛出，让测试直接失败。"""
+
+
+def normalize(statement: str) -> str:
+    sql = _WS.sub(" ", statement).strip()
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _IN_LIST.sub("IN (...)", sql)
+
+
+def _frames():
+    frame = sys._getframe(1)
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+    # AsyncSession 在子 greenlet 中执行同步代码，业务代码的栈在父 greenlet 上
+    if greenlet is not None:
+        parent = greenlet.getcurrent().parent
+        frame = parent.gr_frame if parent is not None else None
+        while frame is not None:
+            yield frame
+            frame = frame.f_back
+
+
+def _describe(frame, filename: str) -> str:
+    if filename.startswith(_APP_DIR):
+        filename = os.path.relpath(filename, os.path.dirname(_APP_DIR))
+    return f"{filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+def call_site() -> str:
+    """最内层的 app/ 下（本模块除外）的调用位置；不在 app/ 内（如测试脚本）时取最内层的非库代码。"""
+    fallback = None
+    for frame in _frames():
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename == _THIS_FILE:
+            continue
+        if filename.startswith(_APP_DIR):
+            return _describe(frame, filename)
+        if fallback is None and f"{os.sep}site-packages{os.sep}" not in filename and "<" not in filename:
+            fallback = _describe(frame, filename)
+    return fallback or "?"
+
+
+class _Group:
+    __slots__ = ("count", "seconds", "params", "site")
+
+    def __init__(self, site: str):
+        self.count = 0
+        self.seconds = 0.0
+        self.params: Set[int] = set()
+        self.site = site
+
+
+class QueryTrace:
+    """一个请求（或 capture 块）内执行过的语句，按归一化 SQL 分组。"""
+
+    def __init__(self, label: str, strict: bool):
+        self.label = label
+        self.strict = strict
+        self.groups: Dict[str, _Group] = {}
+        self.slow: List[str] = []
+
+    def add(self, statement: str, parameters, seconds: float):
+        sql = normalize(statement)
+        group = self.groups.get(sql)
+        if group is None:
+            group = self.groups[sql] = _Group(call_site())
+        group.count += 1
+        group.seconds += seconds
+        if len(group.params) <= settings.QUERY_TRACE_N_PLUS_ONE:
+            try:
+                group.params.add(hash(repr(parameters)))
+            except Exception:
+                pass
+        if seconds * 1000 >= settings.QUERY_TRACE_SLOW_MS:
+            self.slow.append(f"slow query {seconds * 1000:.0f}ms at {call_site()}: {sql[:300]}")
+
+    def issues(self) -> List[str]:
+        found = list(self.slow)
+        threshold = settings.QUERY_TRACE_N_PLUS_ONE
+        for sql, group in self.groups.items():
+            # 同一语句以不同参数重复执行，典型的逐行懒加载
+            if group.count >= threshold and len(group.params) >= threshold:
+                found.append(
+                    f"N+1: {group.count} x ({group.seconds * 1000:.1f}ms) at {group.site}: {sql[:300]}"
+                )
+        return found
+
+    def finish(self):
+        issues = self.issues()
+        if not issues:
+            return
+        message = f"query trace {self.label}:\n  " + "\n  ".join(issues)
+        if self.strict:
+            raise QueryTraceError(message)
+        logger.warning(message)
+
+
+_current: ContextVar[Optional[QueryTrace]] = ContextVar("query_trace", default=None)
+
+
+@contextmanager
+def capture(label: str = "-", strict: Optional[bool] = None):
+    """
+    在代码块内追踪 SQL，结束时报告 N+1 与慢查询；strict 时改为抛出 QueryTraceError。
+
+        with query_trace.capture("list projects", strict=True):
+            ...
+    """
+    trace = QueryTrace(label, settings.QUERY_TRACE_STRICT if strict is None else strict)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+    trace.finish()
+
+
+class QueryTraceMiddleware:
+    """为每个 HTTP 请求建立 QueryTrace，标签为 方法 + 路由模板。"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        trace = QueryTrace(scope["method"] + " " + scope["path"], settings.QUERY_TRACE_STRICT)
+        token = _current.set(trace)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                trace.label = f"{scope['method']} {route}"
+        trace.finish()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("trace_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("trace_query_start")
+    if not stack:
+        return
+    seconds = time.perf_counter() - stack.pop()
+    trace = _current.get()
+    if trace is not None:
+        trace.add(statement, None if executemany else parameters, seconds)
+    elif seconds * 1000 >= settings.QUERY_TRACE_SLOW_MS:
+        # 请求之外（后台任务等）只报告慢查询
+        logger.warning("slow query %.0fms at %s: %s", seconds * 1000, call_site(), normalize(statement)[:300])
+
+
+def _handle_error(context):
+    conn = context.connection
+    stack = conn.info.get("trace_query_start") if conn is not None else None
+    if stack:
+        stack.pop()
+
+
+def instrument_engine(engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
@@ -0,0 +1,176 @@
+import logging
+import math
+import threading
+import time
+from functools import lru_cache
+from typing import Iterable, List, Sequence, Tuple, Union
+
+from fastapi import HTTPException, Request
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=64)
+def parse_rate(rule: str) -> Tuple[int, float]:
+    """ "容量/秒数" -> (容量, 每秒恢复的令牌数)。"""
+    capacity, seconds = rule.split("/", 1)
+    capacity, seconds = int(capacity), float(seconds)
+    if capacity <= 0 or seconds <= 0:
+        raise ValueError(f"无效的限流规则: {rule}")
+    return capacity, capacity / seconds
+
+
+class MemoryBackend:
+    """进程内令牌桶；桶满时自然过期，最多保留 RATE_LIMIT_MEMORY_SIZE 个。"""
+
+    def __init__(self, maxsize: int):
+        self._buckets = TTLCache(maxsize)
+        self._lock = threading.Lock()
+
+    async def consume(self, key: str, capacity: int, refill: float, cost: int = 1) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - ts) * refill)
+            retry_after = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                retry_after = (cost - tokens) / refill
+            self._buckets.set(key, (tokens, now), ttl=(capacity - tokens) / refill)
+        return retry_after
+
+
+# KEYS[1]=桶；ARGV=容量, 每毫秒恢复的令牌数, 消耗数。返回需要等待的毫秒数，0 表示放行
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1])
+local ts = tonumber(data[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = math.ceil((cost - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1000)
+return wait
+"""
+
+
+class RedisBackend:
+    """基于 Redis Lua 脚本的令牌桶，读改写原子完成，多个 worker 共享同一份状态。"""
+
+    def __init__(self, client, prefix: str = "rl:"):
+        self._client = client
+        self._prefix = prefix
+        self._script = client.register_script(_TOKEN_BUCKET_LUA)
+
+    async def consume(self, key: str, capacity: int, refill: float, cost: int = 1) -> float:
+        wait_ms = await self._script(keys=[self._prefix + key], args=[capacity, refill / 1000, cost])
+        return int(wait_ms) / 1000
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.RATE_LIMIT_BACKEND == "redis":
+                    client = get_redis()
+                    if client is None:
+                        raise RuntimeError("RATE_LIMIT_BACKEND=redis 需要配置 REDIS_URL")
+                    _backend = RedisBackend(client)
+                else:
+                    _backend = MemoryBackend(settings.RATE_LIMIT_MEMORY_SIZE)
+    return _backend
+
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def _body_values(request: Request, fields: Sequence[str]) -> List[str]:
+    # FastAPI 已经解析过请求体，request.json() 直接返回缓存结果
+    try:
+        body = await request.json()
+    except Exception:
+        return []
+    if not isinstance(body, dict):
+        return []
+    return [str(body[f]).strip().lower() for f in fields if body.get(f)]
+
+
+Dimension = Union[str, Tuple[str, ...]]
+
+
+class RateLimit:
+    """
+    令牌桶限流依赖：rules 为 (维度, 规则配置名)。维度 "ip" 按客户端 IP，
+    元组则按请求体中的对应字段（如 ("username", "email")）分别计数。
+    超限直接返回 429 和 Retry-After，不再进入数据库或 bcrypt。
+
+        @router.post("/login", dependencies=[Depends(RateLimit("login", ("ip", "RATE_LIMIT_LOGIN_IP")))])
+    """
+
+    def __init__(self, scope: str, *rules: Tuple[Dimension, str]):
+        self.scope = scope
+        self.rules = rules
+
+    async def _keys(self, request: Request, dimension: Dimension) -> Iterable[str]:
+        if dimension == "ip":
+            return [f"{self.scope}:ip:{client_ip(request)}"]
+        return [f"{self.scope}:acct:{v}" for v in await _body_values(request, dimension)]
+
+    async def __call__(self, request: Request):
+        if settings.RATE_LIMIT_BACKEND == "none":
+            return
+        backend = get_backend()
+        for dimension, setting_name in self.rules:
+            capacity, refill = parse_rate(getattr(settings, setting_name))
+            for key in await self._keys(request, dimension):
+                try:
+                    retry_after = await backend.consume(key, capacity, refill)
+                except Exception as e:
+                    # 限流后端故障时只放行出错的这个键，避免把登录等接口一起拖垮；其余维度照常检查
+                    logger.warning("rate limit backend error for %s: %s", key, e)
+                    continue
+                if retry_after > 0:
+                    raise HTTPException(
+                        status_code=429,
+                        detail="请求过于频繁，请稍后再试",
+                        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                    )
+
+
+login_rate_limit = RateLimit(
+    "login", ("ip", "RATE_LIMIT_LOGIN_IP"), (("username", "email"), "RATE_LIMIT_LOGIN_ACCOUNT")
+)
+send_code_rate_limit = RateLimit(
+    "send_code", ("ip", "RATE_LIMIT_SEND_CODE_IP"), (("email",), "RATE_LIMIT_SEND_CODE_EMAIL")
+)
+reset_password_rate_limit = RateLimit(
+    "reset", ("ip", "RATE_LIMIT_RESET_IP"), (("email",), "RATE_LIMIT_RESET_EMAIL")
+)
@@ -0,0 +1,26 @@
+from app.core.config import settings
+
+_client = None
+
+
+def get_redis():
+    """
+    按 REDIS_URL 懒加载共享的 redis.asyncio 客户端；未配置时返回 None。
+    REDIS_URL=fakeredis:// 使用进程内的 fakeredis，仅用于本地调试与测试。
+    """
+    global _client
+    if _client is None and settings.REDIS_URL:
+        if settings.REDIS_URL.startswith("fakeredis://"):
+            import fakeredis
+            _client = fakeredis.aioredis.FakeRedis()
+        else:
+            import redis.asyncio as redis
+            _client = redis.from_url(settings.REDIS_URL)
+    return _client
+
+
+async def close_redis():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
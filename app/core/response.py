@@ -1,15 +1,29 @@
-from starlette.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
 from typing import Any, Optional, Dict
 
+from pydantic_core import to_json
+from starlette.responses import JSONResponse
+
+from app.core import metrics
 
-def ok(data=None, message="OK", code=0) -> Dict[str, Any]:
 
-    return {"code": code, "message": message, "data": data}
+class EnvelopeResponse(JSONResponse):
+    """
+    直接用 pydantic-core 把 {code, message, data} 序列化为 bytes：
+    data 中可以直接放 pydantic 模型（及其列表），不再经过 model_dump / jsonable_encoder / json.dumps。
+    """
 
+    def render(self, content: Any) -> bytes:
+        # 无法识别的类型（如校验错误 ctx 中的异常对象）退回 str，与 jsonable_encoder 的宽松行为一致
+        with metrics.timed("serialize"):
+            return to_json(content, fallback=str)
 
-def err(message="Bad Request", code=40000, status_code=400, data=None):
 
-    payload = {"code": code, "message": message, "data": data}
-    return JSONResponse(content=jsonable_encoder(payload), status_code=status_code)
+def ok(data=None, message="OK", code=0) -> EnvelopeResponse:
 
+    return EnvelopeResponse({"code": code, "message": message, "data": data})
+
+
+def err(message="Bad Request", code=40000, status_code=400, data=None, headers: Optional[Dict[str, str]] = None):
+
+    payload = {"code": code, "message": message, "data": data}
+    return EnvelopeResponse(payload, status_code=status_code, headers=headers)
@@ -1,13 +1,20 @@
+import hashlib
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Optional, TypedDict
+from typing import Any, Dict, Optional, Tuple, TypedDict
 
 from fastapi import Depends, Header, HTTPException, status
 from jose import jwt, JWTError
 from passlib.context import CryptContext
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core import metrics
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.db.session import get_db
+from app.db.async_session import get_async_db
 from app.models import User
 
 ALGORITHM = "HS256"
@@ -21,6 +28,58 @@ class TokenPayload(TypedDict, total=False):
     iat: int
     typ: str  # "access" | "refresh"
     aud: str
+    ver: int  # 令牌版本，用于吊销
+    name: str  # 用户名（仅 access）
+    adm: bool  # 签发时是否管理员（仅 access）；无状态鉴权以数据库中的 isAdmin 为准
+
+
+# 令牌版本保存在 users.tokenVersion 中，所有 worker 共享，重启后依然有效。
+# 无状态鉴权时按 uid 缓存 (tokenVersion, isAdmin)：本进程的吊销立即生效，
+# 其它 worker 的吊销与管理员权限变更最多延迟 TOKEN_VERSION_CACHE_TTL_SECONDS。
+_auth_states = TTLCache(settings.TOKEN_VERSION_CACHE_SIZE, settings.TOKEN_VERSION_CACHE_TTL_SECONDS)
+
+_AUTH_STATE = select(User.tokenVersion, User.isAdmin)
+
+
+def _remember_auth_state(uid: int, row) -> Tuple[int, bool]:
+    if row is None:
+        raise HTTPException(status_code=404, detail="用户不存在")
+    state = (row.tokenVersion, bool(row.isAdmin))
+    _auth_states.set(uid, state)
+    return state
+
+
+def auth_state(db: Session, uid: int) -> Tuple[int, bool]:
+    """返回 (tokenVersion, isAdmin)。"""
+    state = _auth_states.get(uid)
+    if state is None:
+        state = _remember_auth_state(uid, db.execute(_AUTH_STATE.where(User.uid == uid)).first())
+    return state
+
+
+async def auth_state_async(db: AsyncSession, uid: int) -> Tuple[int, bool]:
+    state = _auth_states.get(uid)
+    if state is None:
+        state = _remember_auth_state(uid, (await db.execute(_AUTH_STATE.where(User.uid == uid))).first())
+    return state
+
+
+async def token_version_async(db: AsyncSession, uid: int) -> int:
+    return (await auth_state_async(db, uid))[0]
+
+
+def revoke_tokens(db: Session, uid: int):
+    """递增令牌版本，使该用户已签发的令牌全部失效；由调用方提交后再调用 forget_token_version。"""
+    db.execute(update(User).where(User.uid == uid).values(tokenVersion=User.tokenVersion + 1))
+
+
+def forget_token_version(uid: int):
+    _auth_states.pop(uid)
+
+
+def _check_token_version(payload: TokenPayload, version: int):
+    if payload.get("ver", 0) < version:
+        raise HTTPException(status_code=401, detail="令牌已失效，请重新登录")
 
 
 def create_token(
@@ -29,6 +88,8 @@ def create_token(
     minutes: int,
     kind: str = "access",
     audience: str = "event-frontend",
+    version: int = 0,
+    claims: Optional[Dict[str, Any]] = None,
 ) -> str:
     now = datetime.now(timezone.utc)
     payload: TokenPayload = {
@@ -37,17 +98,36 @@ def create_token(
         "exp": int((now + timedelta(minutes=minutes)).timestamp()),
         "typ": kind,
         "aud": audience,
+        "ver": version,
     }
+    if claims:
+        payload.update(claims)
     return jwt.encode(payload, settings.SECURITY_KEY, algorithm=ALGORITHM)
 
 
+# 已验证的令牌载荷缓存：key 为原始令牌的 sha256，条目在令牌自身 exp 时过期
+_token_cache = TTLCache(settings.TOKEN_CACHE_SIZE)
+
+metrics.sample("token_cache_hits_total", "已验证令牌缓存命中次数", lambda: _token_cache.hits, kind="counter")
+metrics.sample("token_cache_misses_total", "已验证令牌缓存未命中次数", lambda: _token_cache.misses, kind="counter")
+metrics.sample("token_cache_entries", "已验证令牌缓存当前条目数", lambda: len(_token_cache))
+
+
 def decode_token(token: str) -> TokenPayload:
+    """返回的载荷是缓存条目的副本，调用方可以随意修改。"""
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    cached = _token_cache.get(key)
+    if cached is not None:
+        return dict(cached)  # type: ignore[return-value]
     try:
         payload = jwt.decode(token, settings.SECURITY_KEY, algorithms=[ALGORITHM], options={"verify_aud": False})
         # Audience check left to caller if needed
-        return payload  # type: ignore[return-value]
     except JWTError as e:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="无效或过期的令牌") from e
+    exp = payload.get("exp")
+    if exp is not None:
+        _token_cache.set(key, payload, ttl=exp - time.time())
+    return dict(payload)  # type: ignore[return-value]
 
 
 def bearer_token_from_header(authorization: Optional[str]) -> str:
@@ -59,29 +139,124 @@ def bearer_token_from_header(authorization: Optional[str]) -> str:
     return parts[1]
 
 
-def get_current_user(
-    authorization: Optional[str] = Header(None, alias="Authorization"),
-    db: Session = Depends(get_db),
-) -> User:
+class Principal:
+    """
+    当前请求的身份。uid/username 直接取自 access token，isAdmin 取自（缓存的）数据库值，
+    完整的 User 只有在访问 .user（或其它 User 属性）时才查询数据库。
+    """
+
+    def __init__(self, uid: int, username: Optional[str], isAdmin: bool,
+                 db: Optional[Session] = None, user: Optional[User] = None):
+        self.uid = uid
+        self.username = username
+        self.isAdmin = isAdmin
+        self._db = db
+        self._user = user
+
+    @classmethod
+    def from_claims(cls, payload: TokenPayload, isAdmin: bool, db: Optional[Session] = None) -> "Principal":
+        return cls(int(payload["sub"]), payload.get("name"), isAdmin, db=db)
+
+    @classmethod
+    def from_user(cls, user: User, db: Optional[Session] = None) -> "Principal":
+        return cls(user.uid, user.username, bool(user.isAdmin), db=db, user=user)
+
+    @property
+    def user(self) -> User:
+        if self._user is None:
+            if self._db is None:
+                raise RuntimeError("Principal 未绑定数据库会话，无法加载 User")
+            self._user = self._db.get(User, self.uid)
+            if not self._user:
+                raise HTTPException(status_code=404, detail="用户不存在")
+        return self._user
+
+    def __getattr__(self, name: str):
+        # 兼容直接把 current_user 当 User 使用的代码（如 MeProfile.model_validate）
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if self._user is None and self._db is None:
+            # 异步依赖返回的 Principal 不绑定同步会话，只有 uid/username/isAdmin
+            raise AttributeError(f"Principal 未绑定数据库会话，没有属性 {name!r}")
+        return getattr(self.user, name)
+
+
+def access_claims(user: User) -> Dict[str, Any]:
+    return {"name": user.username, "adm": bool(user.isAdmin)}
+
+
+def _access_payload(authorization: Optional[str]) -> TokenPayload:
     token = bearer_token_from_header(authorization)
     payload = decode_token(token)
     if payload.get("typ") != "access":
         raise HTTPException(status_code=401, detail="令牌类型错误")
+    return payload
+
+
+def get_current_user(
+    authorization: Optional[str] = Header(None, alias="Authorization"),
+    db: Session = Depends(get_db),
+) -> Principal:
+    payload = _access_payload(authorization)
+    if settings.AUTH_STATELESS and "adm" in payload:
+        version, is_admin = auth_state(db, int(payload["sub"]))
+        _check_token_version(payload, version)
+        return Principal.from_claims(payload, is_admin, db)
     user_id = payload.get("sub")
     user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
-    return user
+    _check_token_version(payload, user.tokenVersion)
+    return Principal.from_user(user, db)
 
 
 def get_current_admin(
     authorization: Optional[str] = Header(None, alias="Authorization"),
     db: Session = Depends(get_db),
-) -> User:
-    user = get_current_user(authorization, db)
-    if not getattr(user, "isAdmin", False):
+) -> Principal:
+    principal = get_current_user(authorization, db)
+    if not principal.isAdmin:
+        raise HTTPException(status_code=403, detail="需要管理员权限")
+    return principal
+
+
+async def get_current_user_async(
+    authorization: Optional[str] = Header(None, alias="Authorization"),
+    db: AsyncSession = Depends(get_async_db),
+) -> Principal:
+    payload = _access_payload(authorization)
+    if settings.AUTH_STATELESS and "adm" in payload:
+        version, is_admin = await auth_state_async(db, int(payload["sub"]))
+        _check_token_version(payload, version)
+        return Principal.from_claims(payload, is_admin)
+    user = await db.get(User, int(payload.get("sub")))
+    if not user:
+        raise HTTPException(status_code=404, detail="用户不存在")
+    _check_token_version(payload, user.tokenVersion)
+    return Principal.from_user(user)
+
+
+async def ticket_uid_async(ticket: str, kind: str, db: AsyncSession) -> int:
+    """
+    校验专用短期票据（如 SSE 的 typ="sse"），返回 uid。
+    票据用于无法设置请求头、只能放进 URL 的场景，不能当作 access token 使用，反之亦然。
+    """
+    payload = decode_token(ticket)
+    if payload.get("typ") != kind:
+        raise HTTPException(status_code=401, detail="令牌类型错误")
+    uid = int(payload["sub"])
+    _check_token_version(payload, await token_version_async(db, uid))
+    return uid
+
+
+async def get_current_admin_async(
+    authorization: Optional[str] = Header(None, alias="Authorization"),
+    db: AsyncSession = Depends(get_async_db),
+) -> Principal:
+    principal = await get_current_user_async(authorization, db)
+    if not principal.isAdmin:
         raise HTTPException(status_code=403, detail="需要管理员权限")
-    return user
+    return principal
 
 
 def _truncate_for_bcrypt(raw: str) -> bytes:
@@ -0,0 +1,37 @@
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.core.config import settings
+
+# 同步驱动 -> 对应的异步驱动
+_ASYNC_DRIVERS = {
+    "mysql": "aiomysql",
+    "sqlite": "aiosqlite",
+}
+
+
+def to_async_url(url: str) -> URL:
+    u = make_url(url)
+    driver = _ASYNC_DRIVERS.get(u.get_backend_name())
+    if driver is None:
+        # 未知方言（或已经是异步驱动）原样返回
+        return u
+    return u.set(drivername=f"{u.get_backend_name()}+{driver}")
+
+
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL or to_async_url(settings.DATABASE_URL),
+    pool_size=16,
+    max_overflow=80,
+    pool_timeout=30,
+    pool_recycle=1800,
+    pool_pre_ping=True,
+    echo=False,
+)
+
+# expire_on_commit=False：异步会话中提交后不能再隐式懒加载属性
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,30 +1,42 @@
+import asyncio
+import secrets
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 import os
 from dotenv import load_dotenv
 # 显式加载 MySQL 环境文件
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env.mysql"))
 
-from app.db.session import engine, Base
+from app.db.session import engine, Base, SessionLocal
+from app.db.async_session import async_engine
 from app.models import * # noqa: F401,F403
 from sqlalchemy.engine import url as sa_url
 from fastapi.exceptions import RequestValidationError
 from fastapi import Request
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from app.core.config import settings
-from app.core.response import err
+from app.core import metrics, query_trace
+from app.core.response import err, EnvelopeResponse
+from app.core.hashing import shutdown_executor
+from app.core.redis import close_redis
 from app.routers.auth_router import router as auth_router
 from app.routers.user_router import router as user_router
 from app.routers.registration_router import router as registration_router
 from app.routers.project_router import router as project_router
 from app.routers.upload_router import router as upload_router
 from app.routers.admin import router as admin_router
+from app.routers.static_router import router as static_router
+from app.services.upload_service import UploadService
+from app.services.stats_service import StatsService, acquire_reconcile_lease
+from app.services.vcode_store import SqlCodeStore
+from starlette.concurrency import run_in_threadpool
+from app.services import event_broker, thumbnail_service, mail_queue
 
 
-app = FastAPI(title="Event Backend")
+app = FastAPI(title="Event Backend", default_response_class=EnvelopeResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,8 +46,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.QUERY_TRACE_ENABLED:
+    app.add_middleware(query_trace.QueryTraceMiddleware)
+    query_trace.instrument_engine(engine)
+    query_trace.instrument_engine(async_engine.sync_engine)
+
+if settings.METRICS_ENABLED:
+    # 最后添加的中间件在最外层，计时覆盖 CORS 处理
+    app.add_middleware(metrics.MetricsMiddleware, server_timing=settings.METRICS_SERVER_TIMING)
+    metrics.instrument_engine(engine)
+    metrics.instrument_engine(async_engine.sync_engine)
+    if not settings.METRICS_TOKEN:
+        print("[WARN] METRICS_ENABLED 但未设置 METRICS_TOKEN，/metrics 无需鉴权即可访问")
+
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-app.mount("/static", StaticFiles(directory=settings.UPLOAD_DIR), name="static")
 
 
 app.include_router(auth_router)
@@ -44,6 +68,7 @@ app.include_router(registration_router)
 app.include_router(project_router)
 app.include_router(upload_router)
 app.include_router(admin_router)
+app.include_router(static_router)
 
 
 if not settings.SECURITY_KEY or len(settings.SECURITY_KEY) < 32:
@@ -58,7 +83,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
-    return err(str(exc.detail), code=exc.status_code * 100, status_code=exc.status_code)
+    return err(str(exc.detail), code=exc.status_code * 100, status_code=exc.status_code, headers=exc.headers)
 
 
 @app.exception_handler(Exception)
@@ -79,6 +104,96 @@ def on_startup():
     print("[OK] Database tables ensured. Models:", list(Base.metadata.tables.keys()))
 
 
+def _sweep_uploads():
+    db = SessionLocal()
+    try:
+        service = UploadService(db)
+        return service.purge_unclaimed_attachments(), service.purge_unreferenced_blobs(), service.purge_stale_tempfiles()
+    finally:
+        db.close()
+
+
+async def _upload_sweep_loop():
+    # （设置了 UPLOAD_UNCLAIMED_TTL_HOURS 时）未认领附件 -> 归还 Blob 引用 -> 删除引用归零的 Blob 文件；启动时先执行一次
+    while True:
+        try:
+            attachments, blobs, tempfiles = await run_in_threadpool(_sweep_uploads)
+            if attachments or blobs or tempfiles:
+                print("[OK] Purged unclaimed attachments / unreferenced blobs / temp files:", attachments, blobs, tempfiles)
+        except Exception as e:
+            print("[WARN] upload sweep failed:", e)
+        await asyncio.sleep(settings.UPLOAD_SWEEP_INTERVAL_SECONDS)
+
+
+def _reconcile_stats():
+    db = SessionLocal()
+    try:
+        return StatsService(db).reconcile()
+    finally:
+        db.close()
+
+
+async def _stats_reconcile_loop():
+    # 对账会扫描业务表：各 worker 每个周期竞争一次租约，同一周期内只有拿到租约的进程执行
+    interval = settings.STATS_RECONCILE_INTERVAL_SECONDS
+    while True:
+        try:
+            if await acquire_reconcile_lease(interval):
+                drift = await run_in_threadpool(_reconcile_stats)
+                if drift:
+                    print("[WARN] stats counters reconciled:", drift)
+        except Exception as e:
+            print("[WARN] stats reconcile failed:", e)
+        await asyncio.sleep(interval)
+
+
+async def _vcode_purge_loop():
+    while True:
+        try:
+            purged = await run_in_threadpool(SqlCodeStore.purge_expired)
+            if purged:
+                print("[OK] Purged expired verification codes:", purged)
+        except Exception as e:
+            print("[WARN] verification code purge failed:", e)
+        await asyncio.sleep(settings.VERIFICATION_CODE_PURGE_INTERVAL_SECONDS)
+
+
+@app.on_event("startup")
+async def start_background_jobs():
+    if settings.STATS_RECONCILE_INTERVAL_SECONDS > 0:
+        app.state.stats_reconcile_task = asyncio.create_task(_stats_reconcile_loop())
+    app.state.upload_sweep_task = asyncio.create_task(_upload_sweep_loop())
+    if settings.VERIFICATION_CODE_BACKEND == "sql":
+        app.state.vcode_purge_task = asyncio.create_task(_vcode_purge_loop())
+    mail_queue.start()
+    await event_broker.get_broker().start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    for name in ("stats_reconcile_task", "vcode_purge_task", "upload_sweep_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    await mail_queue.stop()
+    await event_broker.get_broker().stop()
+    shutdown_executor()
+    thumbnail_service.shutdown_executor()
+    await close_redis()
+    await async_engine.dispose()
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics(request: Request):
+    # 指标按 worker 进程各自统计，多 worker 部署时需分别抓取
+    if not settings.METRICS_ENABLED:
+        return err("未启用指标", code=40400, status_code=404)
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if settings.METRICS_TOKEN and not secrets.compare_digest(request.headers.get("authorization", ""), expected):
+        return err("未授权", code=40100, status_code=401)
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/healthz")
 def healthz():
     from datetime import datetime, timezone
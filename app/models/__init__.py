@@ -2,6 +2,10 @@ from .user_model import User
 from .registration_model import Registration
 from .project_model import Project
 from .attachment_model import Attachment
+from .blob_model import Blob
 from .verification_code import VerificationCode
+from .stats_counter import StatsCounter
+from .id_sequence import IdSequence
+from .outbound_mail import OutboundMail
 
-__all__ = ["User", "Registration", "Project", "Attachment", "VerificationCode"]
+__all__ = ["User", "Registration", "Project", "Attachment", "Blob", "VerificationCode", "StatsCounter", "IdSequence", "OutboundMail"]
@@ -18,9 +18,21 @@ class Attachment(Base):
     key = Column(String(255), nullable=False)
     originalFilename = Column(String(255), nullable=True)
     mimeType = Column(String(100), nullable=True)
+    # 内容哈希，指向共享的 Blob；旧数据为空
+    sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=True, index=True)
+
+    # 后台生成的 WebP 缩略图；width/height 为原图（PDF 为首页）尺寸
+    thumbnailUrl = Column(String(500), nullable=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
 
     createdAt = Column(DateTime, default=lambda: datetime.utcnow(), nullable=False)
 
     uploader = relationship("User")
     project = relationship("Project", back_populates="attachments")
     registration = relationship("Registration", back_populates="attachments")
+
+    @property
+    def etag(self) -> str | None:
+        # 内容不变则哈希不变，可直接作为强 ETag
+        return f'"{self.sha256}"' if self.sha256 else None
@@ -0,0 +1,17 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+from app.db.session import Base
+
+
+class Blob(Base):
+    """按内容寻址存储的文件本体，多个 Attachment 可以引用同一个 Blob。"""
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    mimeType = Column(String(100), nullable=True)
+    # 相对 UPLOAD_DIR 的存储路径，如 blobs/ab/cd/<sha256>.pdf
+    path = Column(String(255), nullable=False)
+    refCount = Column(Integer, nullable=False, default=0, server_default="0")
+
+    createdAt = Column(DateTime, default=lambda: datetime.utcnow(), nullable=False)
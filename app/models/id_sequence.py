@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, BigInteger
+from app.db.session import Base
+
+
+class IdSequence(Base):
+    """命名序列，按块预留号段（如 UID 分配器）。nextValue 为下一个未分配的序号。"""
+    __tablename__ = "id_sequences"
+
+    name = Column(String(64), primary_key=True)
+    nextValue = Column(BigInteger, nullable=False, default=0, server_default="0")
@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from app.db.session import Base
+
+
+class OutboundMail(Base):
+    """持久化的发信队列，由各 worker 的发信循环认领并发送。"""
+    __tablename__ = "mail_queue"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    recipient = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    subtype = Column(String(16), nullable=False, default="plain", server_default="plain")
+
+    # pending -> sent / failed；发送中的行仍为 pending，靠 claimToken + nextAttemptAt 租约避免重复认领
+    status = Column(String(16), nullable=False, default="pending", server_default="pending")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    nextAttemptAt = Column(DateTime, default=lambda: datetime.utcnow(), nullable=False)
+    claimToken = Column(String(32), nullable=True)
+    lastError = Column(String(500), nullable=True)
+
+    createdAt = Column(DateTime, default=lambda: datetime.utcnow(), nullable=False)
+    sentAt = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_mail_queue_status_next", "status", "nextAttemptAt"),)
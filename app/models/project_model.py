@@ -25,5 +25,8 @@ class Project(Base):
     user = relationship("User", back_populates="projects")
 
     attachments = relationship("Attachment", back_populates="project", cascade="all, delete-orphan")
-    __table_args__ = (Index("ix_project_user_created", "uid", "createdAt"),)
+    __table_args__ = (
+        Index("ix_project_user_created", "uid", "createdAt"),
+        Index("ix_project_created", "createdAt"),
+    )
 
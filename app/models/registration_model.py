@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 
@@ -16,3 +16,9 @@ class Registration(Base):
     user = relationship("User", back_populates="registrations")
 
     attachments = relationship("Attachment", back_populates="registration", cascade="all, delete-orphan")
+
+    # 管理端按 (createdAt, registrationId) 做 keyset 分页，可选按 status 过滤
+    __table_args__ = (
+        Index("ix_registration_status_created", "status", "createdAt"),
+        Index("ix_registration_created", "createdAt"),
+    )
@@ -0,0 +1,22 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, BigInteger
+from app.db.session import Base
+
+
+class StatsCounter(Base):
+    """
+    增量维护的统计计数器，随业务写操作在同一事务内更新。
+    bucket 为空串表示总量，否则为按天（UTC，YYYY-MM-DD）的直方图桶。
+    """
+    __tablename__ = "stats_counters"
+
+    name = Column(String(64), primary_key=True)
+    bucket = Column(String(10), primary_key=True, default="", server_default="")
+    value = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+    updatedAt = Column(
+        DateTime,
+        default=lambda: datetime.utcnow(),
+        onupdate=lambda: datetime.utcnow(),
+        nullable=False
+    )
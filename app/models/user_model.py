@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 
@@ -14,6 +14,8 @@ class User(Base):
     bio = Column(Text, nullable=True)
     phone = Column(String(32), nullable=True)
     isAdmin = Column(Boolean, default=False, nullable=False)
+    # 令牌版本：重置密码等操作递增，签发时写入令牌的 ver，低于该值的令牌一律拒绝
+    tokenVersion = Column(Integer, default=0, server_default="0", nullable=False)
 
     createdAt = Column(DateTime, default=lambda: datetime.utcnow(), nullable=False)
     updatedAt = Column(
@@ -25,3 +27,4 @@ class User(Base):
 
     registrations = relationship("Registration", back_populates="user", cascade="all, delete-orphan")
     projects = relationship("Project", back_populates="user", cascade="all, delete-orphan")
+    __table_args__ = (Index("ix_user_created", "createdAt"),)
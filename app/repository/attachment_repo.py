@@ -1,8 +1,13 @@
+from datetime import datetime
+from typing import List, Sequence, Tuple
+from sqlalchemy import delete, exists, update, select
 from sqlalchemy.orm import Session
+from app.models import User
 from app.models.attachment_model import Attachment
+from app.repository import blob_repo, stats_repo
 
 
-def create_attachment(db: Session, user_id: int, url: str, key: str, filename: str, mime: str) -> Attachment:
+def create_attachment(db: Session, user_id: int, url: str, key: str, filename: str, mime: str, sha256: str | None = None) -> Attachment:
     new_attachment = Attachment(
         uploadedByUid=user_id,
         projectId=None,
@@ -10,9 +15,11 @@ def create_attachment(db: Session, user_id: int, url: str, key: str, filename: s
         url=url,
         key=key,
         originalFilename=filename,
-        mimeType=mime
+        mimeType=mime,
+        sha256=sha256
     )
     db.add(new_attachment)
+    stats_repo.record_attachments(db)
     return new_attachment
 
 
@@ -20,11 +27,75 @@ def get_attachment_by_id(db: Session, attachment_id: int) -> Attachment | None:
     return db.get(Attachment, attachment_id)
 
 
-def link_attachment_to_project(db: Session, attachment: Attachment, project_id: int):
-    attachment.projectId = project_id
-    db.add(attachment)
+def get_attachments_by_ids(db: Session, attachment_ids: Sequence[int]) -> List[Attachment]:
+    if not attachment_ids:
+        return []
+    return list(db.execute(select(Attachment).where(Attachment.id.in_(attachment_ids))).scalars().all())
 
 
-def link_attachment_to_registration(db: Session, attachment: Attachment, registration_id: int):
-    attachment.registrationId = registration_id
-    db.add(attachment)
\ No newline at end of file
+def claim_attachments(db: Session, attachment_ids: Sequence[int], user_id: int, *,
+                      project_id: int | None = None, registration_id: int | None = None) -> int:
+    """
+    一条 UPDATE 把未被使用的附件挂到项目/报名上，返回实际认领的行数。
+    WHERE 中的 IS NULL 条件保证并发提交时同一附件只会被认领一次。
+    """
+    if not attachment_ids:
+        return 0
+    values = {"projectId": project_id} if project_id is not None else {"registrationId": registration_id}
+    res = db.execute(
+        update(Attachment)
+        .where(
+            Attachment.id.in_(attachment_ids),
+            Attachment.uploadedByUid == user_id,
+            Attachment.projectId.is_(None),
+            Attachment.registrationId.is_(None),
+        )
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return res.rowcount
+
+
+def lock_unclaimed(db: Session, before: datetime, limit: int) -> List[Tuple[int, str | None]]:
+    """
+    锁定 before 之前上传、至今未被项目/报名认领的附件，返回 [(id, sha256)]。
+    只处理内容寻址上传的附件（sha256 为空的旧数据不动）；被用作头像（avatarUrl 指向该附件）的不算未认领；
+    加锁后并发的认领会等待本事务结束。
+    """
+    stmt = (
+        select(Attachment.id, Attachment.sha256)
+        .where(
+            Attachment.projectId.is_(None),
+            Attachment.registrationId.is_(None),
+            Attachment.sha256.is_not(None),
+            Attachment.createdAt < before,
+            ~exists().where(User.avatarUrl == Attachment.url),
+        )
+        .order_by(Attachment.id)
+        .limit(limit)
+        .with_for_update()
+    )
+    return [(aid, sha256) for aid, sha256 in db.execute(stmt).all()]
+
+
+def delete_attachments(db: Session, rows: Sequence[Tuple[int, str | None]]) -> int:
+    """删除 [(id, sha256)] 对应的附件，并归还 Blob 引用、同步附件计数。"""
+    if not rows:
+        return 0
+    res = db.execute(
+        delete(Attachment)
+        .where(Attachment.id.in_([aid for aid, _ in rows]))
+        .execution_options(synchronize_session=False)
+    )
+    blob_repo.release_blobs(db, (sha256 for _, sha256 in rows))
+    stats_repo.record_attachments(db, -len(rows))
+    return res.rowcount
+
+
+def set_thumbnail(db: Session, attachment_id: int, thumbnail_url: str, width: int, height: int):
+    db.execute(
+        update(Attachment)
+        .where(Attachment.id == attachment_id)
+        .values(thumbnailUrl=thumbnail_url, width=width, height=height)
+    )
+
@@ -0,0 +1,32 @@
+from collections import Counter
+from typing import Iterable, List
+from sqlalchemy import update, delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import Blob
+
+
+def acquire_blob(db: Session, sha256: str, size: int, mime: str, path: str):
+    # 先尝试原子自增；不存在时插入，并发插入冲突则退回自增
+    res = db.execute(update(Blob).where(Blob.sha256 == sha256).values(refCount=Blob.refCount + 1))
+    if res.rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.add(Blob(sha256=sha256, size=size, mimeType=mime, path=path, refCount=1))
+    except IntegrityError:
+        db.execute(update(Blob).where(Blob.sha256 == sha256).values(refCount=Blob.refCount + 1))
+
+
+def release_blobs(db: Session, hashes: Iterable[str | None]):
+    for sha256, n in Counter(h for h in hashes if h).items():
+        db.execute(update(Blob).where(Blob.sha256 == sha256).values(refCount=Blob.refCount - n))
+
+
+def list_unreferenced(db: Session, limit: int = 500) -> List[Blob]:
+    return list(db.execute(select(Blob).where(Blob.refCount <= 0).limit(limit)).scalars().all())
+
+
+def delete_if_unreferenced(db: Session, sha256: str) -> bool:
+    res = db.execute(delete(Blob).where(Blob.sha256 == sha256, Blob.refCount <= 0))
+    return bool(res.rowcount)
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from typing import List, Sequence
+from sqlalchemy import delete, select, update, func
+from sqlalchemy.orm import Session
+from app.models import OutboundMail
+
+
+def enqueue_mail(db: Session, recipient: str, subject: str, body: str, subtype: str = "plain") -> OutboundMail:
+    mail = OutboundMail(recipient=recipient, subject=subject, body=body, subtype=subtype, nextAttemptAt=datetime.utcnow())
+    db.add(mail)
+    return mail
+
+
+def claim_batch(db: Session, token: str, limit: int, now: datetime, lease_seconds: int) -> List[OutboundMail]:
+    """
+    认领最多 limit 封到期的邮件：把 nextAttemptAt 推后一个租约并写入 claimToken。
+    UPDATE 的 WHERE 再次检查到期条件，多个 worker 同时认领时同一封只会落到一个 worker 上。
+    """
+    due = select(OutboundMail.id).where(
+        OutboundMail.status == "pending", OutboundMail.nextAttemptAt <= now
+    ).order_by(OutboundMail.nextAttemptAt).limit(limit)
+    ids = list(db.execute(due).scalars().all())
+    if not ids:
+        return []
+    db.execute(
+        update(OutboundMail)
+        .where(OutboundMail.id.in_(ids), OutboundMail.status == "pending", OutboundMail.nextAttemptAt <= now)
+        .values(claimToken=token, nextAttemptAt=now + timedelta(seconds=lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    return list(db.execute(
+        select(OutboundMail).where(OutboundMail.claimToken == token, OutboundMail.id.in_(ids))
+    ).scalars().all())
+
+
+def mark_sent(db: Session, ids: Sequence[int], now: datetime):
+    if not ids:
+        return
+    db.execute(
+        update(OutboundMail)
+        .where(OutboundMail.id.in_(ids))
+        .values(status="sent", sentAt=now, claimToken=None, attempts=OutboundMail.attempts + 1, lastError=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def mark_retry(db: Session, mail_id: int, error: str, next_attempt_at: datetime):
+    db.execute(
+        update(OutboundMail)
+        .where(OutboundMail.id == mail_id)
+        .values(nextAttemptAt=next_attempt_at, claimToken=None, attempts=OutboundMail.attempts + 1, lastError=error[:500])
+        .execution_options(synchronize_session=False)
+    )
+
+
+def mark_failed(db: Session, mail_id: int, error: str):
+    db.execute(
+        update(OutboundMail)
+        .where(OutboundMail.id == mail_id)
+        .values(status="failed", claimToken=None, attempts=OutboundMail.attempts + 1, lastError=error[:500])
+        .execution_options(synchronize_session=False)
+    )
+
+
+def purge_finished(db: Session, before: datetime, limit: int) -> int:
+    """删除最多 limit 封在 before 之前已发送或最终失败的邮件；完成时的 nextAttemptAt 即最后一次认领时间，可走状态索引。"""
+    ids = list(db.execute(
+        select(OutboundMail.id)
+        .where(OutboundMail.status.in_(("sent", "failed")), OutboundMail.nextAttemptAt < before)
+        .limit(limit)
+    ).scalars().all())
+    if not ids:
+        return 0
+    db.execute(delete(OutboundMail).where(OutboundMail.id.in_(ids)).execution_options(synchronize_session=False))
+    return len(ids)
+
+
+def queue_depth(db: Session) -> int:
+    return db.execute(
+        select(func.count()).select_from(OutboundMail).where(OutboundMail.status == "pending")
+    ).scalar_one()
@@ -1,8 +1,12 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 from app.models import Project
+from app.repository import blob_repo, stats_repo
 from app.schemas import ProjectIn
-from typing import List
+from app.utils.pagination import keyset_page, split_page
+from typing import Iterator, List
 
 
 def create_project(db: Session, data: ProjectIn, user_id: int) -> Project:
@@ -15,6 +19,7 @@ def create_project(db: Session, data: ProjectIn, user_id: int) -> Project:
         demoUrl=data.demoUrl
     )
     db.add(p)
+    stats_repo.record_project(db)
     return p
 
 
@@ -28,15 +33,45 @@ def get_project_by_id(db: Session, project_id: int) -> Project:
     )
 
 
-def get_projects_by_uid(db: Session, user_id: int) -> List[Project]:
+async def get_project_by_id_async(db: AsyncSession, project_id: int) -> Project | None:
+    stmt = (
+        select(Project)
+        .options(selectinload(Project.attachments))
+        .where(Project.projectId == project_id)
+    )
+    return (await db.execute(stmt)).scalars().first()
 
-    return (
-        db.query(Project)
-        .filter(Project.uid == user_id)
-        .options(joinedload(Project.attachments))
+
+async def get_projects_by_uid_async(db: AsyncSession, user_id: int) -> List[Project]:
+    stmt = (
+        select(Project)
+        .where(Project.uid == user_id)
+        .options(selectinload(Project.attachments))
         .order_by(Project.createdAt.desc())
-        .all()
     )
+    return list((await db.execute(stmt)).scalars().all())
+
+
+async def list_projects_async(db: AsyncSession, page: int, page_size: int, cursor: str | None = None):
+    stmt = keyset_page(
+        select(Project).options(selectinload(Project.attachments)),
+        Project.createdAt, Project.projectId, page, page_size, cursor
+    )
+    rows = list((await db.execute(stmt)).scalars().all())
+    items, next_cursor = split_page(rows, page_size, "createdAt", "projectId")
+    return items, next_cursor
+
+
+def iter_projects(db: Session, user_id: int | None, batch_size: int) -> Iterator[Project]:
+    stmt = select(Project)
+    if user_id is not None:
+        stmt = stmt.where(Project.uid == user_id)
+    stmt = (
+        stmt.options(selectinload(Project.attachments))
+        .order_by(Project.projectId)
+        .execution_options(yield_per=batch_size)
+    )
+    return iter(db.scalars(stmt))
 
 
 def update_project(db: Session, project: Project, *, title=None, description=None, repoUrl=None, demoUrl=None) -> Project:
@@ -53,4 +88,8 @@ def update_project(db: Session, project: Project, *, title=None, description=Non
 
 
 def delete_project(db: Session, project: Project):
+    # 附件随项目级联删除，先归还其引用的 Blob
+    blob_repo.release_blobs(db, (a.sha256 for a in project.attachments))
+    stats_repo.record_project(db, -1)
+    stats_repo.record_attachments(db, -len(project.attachments))
     db.delete(project)
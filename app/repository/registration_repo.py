@@ -1,7 +1,14 @@
+from typing import Iterator, List, Sequence, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 from app.models import Registration
+from collections import Counter
+from datetime import datetime
+from app.repository import blob_repo, stats_repo
 from app.schemas import RegistrationIn
+from app.utils.pagination import keyset_page, split_page
 
 
 def get_registration_by_uid(db: Session, user_id: int, eager_load: bool = False) -> Registration | None:
@@ -12,13 +19,24 @@ def get_registration_by_uid(db: Session, user_id: int, eager_load: bool = False)
     return query.first()
 
 
+async def get_registration_by_uid_async(db: AsyncSession, user_id: int) -> Registration | None:
+    stmt = (
+        select(Registration)
+        .options(selectinload(Registration.attachments))
+        .where(Registration.uid == user_id)
+    )
+    return (await db.execute(stmt)).scalars().first()
+
+
 def create_registration(db: Session, data: RegistrationIn, user_id: int) -> Registration:
     reg = Registration(
         uid=user_id,
         note=data.note,
-        status="pending"
+        status="pending",
+        createdAt=datetime.utcnow()
     )
     db.add(reg)
+    stats_repo.record_registration(db, reg.status, reg.createdAt)
     return reg
 
 
@@ -29,26 +47,70 @@ def get_registration_by_id(db: Session, registration_id: int, eager_load: bool =
     return query.filter(Registration.registrationId == registration_id).first()
 
 
-def list_registrations(db: Session, status: str | None, page: int, page_size: int):
-    q = db.query(Registration)
+async def list_registrations_async(db: AsyncSession, status: str | None, page: int, page_size: int,
+                                   cursor: str | None = None):
+    stmt = select(Registration)
+    if status:
+        stmt = stmt.where(Registration.status == status)
+    stmt = keyset_page(
+        stmt.options(selectinload(Registration.attachments)),
+        Registration.createdAt, Registration.registrationId, page, page_size, cursor
+    )
+    rows = list((await db.execute(stmt)).scalars().all())
+    items, next_cursor = split_page(rows, page_size, "createdAt", "registrationId")
+    return items, next_cursor
+
+
+def iter_registrations(db: Session, status: str | None, batch_size: int) -> Iterator[Registration]:
+    """服务端游标逐批读取（yield_per），每批附件与用户各一次 IN 查询。"""
+    stmt = select(Registration)
     if status:
-        q = q.filter(Registration.status == status)
-    total = q.count()
-    items = (
-        q.options(joinedload(Registration.attachments))
-        .order_by(Registration.createdAt.desc())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-        .all()
+        stmt = stmt.where(Registration.status == status)
+    stmt = (
+        stmt.options(selectinload(Registration.attachments), selectinload(Registration.user))
+        .order_by(Registration.registrationId)
+        .execution_options(yield_per=batch_size)
     )
-    return items, total
+    return iter(db.scalars(stmt))
 
 
 def update_registration_status(db: Session, reg: Registration, status: str) -> Registration:
+    stats_repo.move_registration_status(db, reg.status, status)
     reg.status = status
     db.add(reg)
     return reg
 
 
+def lock_statuses(db: Session, ids: Sequence[int] | None = None,
+                  status: str | None = None) -> List[Tuple[int, str, int]]:
+    """按 ID 列表或当前状态锁定报名行，返回 [(registrationId, status, uid)]。"""
+    stmt = select(Registration.registrationId, Registration.status, Registration.uid)
+    if ids is not None:
+        stmt = stmt.where(Registration.registrationId.in_(ids))
+    if status is not None:
+        stmt = stmt.where(Registration.status == status)
+    stmt = stmt.order_by(Registration.registrationId).with_for_update()
+    return [(rid, s, uid) for rid, s, uid in db.execute(stmt).all()]
+
+
+def bulk_update_status(db: Session, rows: Sequence[Tuple[int, str, int]], status: str) -> int:
+    """rows 为 lock_statuses 的返回值；一条 UPDATE 完成，并同步各状态计数。"""
+    rows = [(rid, old) for rid, old, _ in rows if old != status]
+    if not rows:
+        return 0
+    res = db.execute(
+        update(Registration)
+        .where(Registration.registrationId.in_([rid for rid, _ in rows]), Registration.status != status)
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    )
+    stats_repo.move_registration_statuses(db, Counter(old for _, old in rows), status)
+    return res.rowcount
+
+
 def delete_registration(db: Session, reg: Registration):
+    # 附件随报名级联删除，先归还其引用的 Blob
+    blob_repo.release_blobs(db, (a.sha256 for a in reg.attachments))
+    stats_repo.record_registration(db, reg.status, reg.createdAt, -1)
+    stats_repo.record_attachments(db, -len(reg.attachments))
     db.delete(reg)
@@ -0,0 +1,25 @@
+from sqlalchemy import update, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import IdSequence
+
+
+def reserve_block(db: Session, name: str, size: int) -> int:
+    """
+    原子地预留 [start, start + size) 号段并返回 start。
+    UPDATE 持有行锁直到提交，调用方应尽快单独提交这次预留。
+    """
+    stmt = (
+        update(IdSequence)
+        .where(IdSequence.name == name)
+        .values(nextValue=IdSequence.nextValue + size)
+    )
+    if not db.execute(stmt).rowcount:
+        try:
+            with db.begin_nested():
+                db.add(IdSequence(name=name, nextValue=size))
+            return 0
+        except IntegrityError:
+            db.execute(stmt)
+    next_value = db.execute(select(IdSequence.nextValue).where(IdSequence.name == name)).scalar_one()
+    return next_value - size
@@ -0,0 +1,128 @@
+from datetime import date, datetime
+from typing import Dict, List, Tuple
+from sqlalchemy import update, select, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import StatsCounter
+
+TOTAL = ""
+
+USERS = "users"
+REGISTRATIONS = "registrations"
+PROJECTS = "projects"
+ATTACHMENTS = "attachments"
+# 按天直方图
+DAILY_SIGNUPS = "daily_signups"
+DAILY_REGISTRATIONS = "daily_registrations"
+# 定期对账的租约行，value 为租约到期时间（Unix 秒），不是计数
+RECONCILE_LEASE = "reconcile_lease"
+
+
+def registration_status_counter(status: str) -> str:
+    return f"registrations:{status}"
+
+
+def day_bucket(value: datetime | date | str) -> str:
+    if isinstance(value, str):
+        return value[:10]
+    return value.strftime("%Y-%m-%d")
+
+
+def incr(db: Session, name: str, delta: int = 1, bucket: str = TOTAL):
+    # 与 blob_repo.acquire_blob 相同：先原子自增，不存在再插入，并发插入冲突则退回自增
+    if not delta:
+        return
+    # 先把调用方待写入的对象刷出去，避免其约束冲突被下面的 IntegrityError 分支误吞
+    db.flush()
+    stmt = (
+        update(StatsCounter)
+        .where(StatsCounter.name == name, StatsCounter.bucket == bucket)
+        .values(value=StatsCounter.value + delta, updatedAt=datetime.utcnow())
+    )
+    if db.execute(stmt).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.add(StatsCounter(name=name, bucket=bucket, value=delta))
+    except IntegrityError:
+        db.execute(stmt)
+
+
+def record_user(db: Session, created_at: datetime, delta: int = 1):
+    incr(db, USERS, delta)
+    incr(db, DAILY_SIGNUPS, delta, day_bucket(created_at))
+
+
+def record_registration(db: Session, status: str, created_at: datetime, delta: int = 1):
+    incr(db, REGISTRATIONS, delta)
+    incr(db, registration_status_counter(status), delta)
+    incr(db, DAILY_REGISTRATIONS, delta, day_bucket(created_at))
+
+
+def move_registration_status(db: Session, old_status: str, new_status: str):
+    if old_status == new_status:
+        return
+    incr(db, registration_status_counter(old_status), -1)
+    incr(db, registration_status_counter(new_status), 1)
+
+
+def move_registration_statuses(db: Session, moved_from: Dict[str, int], new_status: str):
+    for old_status, n in moved_from.items():
+        if old_status != new_status:
+            incr(db, registration_status_counter(old_status), -n)
+            incr(db, registration_status_counter(new_status), n)
+
+
+def record_project(db: Session, delta: int = 1):
+    incr(db, PROJECTS, delta)
+
+
+def record_attachments(db: Session, delta: int = 1):
+    incr(db, ATTACHMENTS, delta)
+
+
+def list_counters(db: Session, since_bucket: str | None = None) -> List[StatsCounter]:
+    stmt = select(StatsCounter)
+    if since_bucket is not None:
+        stmt = stmt.where(or_(StatsCounter.bucket == TOTAL, StatsCounter.bucket >= since_bucket))
+    return list(db.execute(stmt).scalars().all())
+
+
+def lock_counters(db: Session) -> Dict[Tuple[str, str], int]:
+    # 对账期间锁住现有计数器，阻塞并发的增量更新，避免覆盖掉它们
+    rows = db.execute(
+        select(StatsCounter).where(StatsCounter.name != RECONCILE_LEASE).with_for_update()
+    ).scalars().all()
+    return {(r.name, r.bucket): r.value for r in rows}
+
+
+def set_counter(db: Session, name: str, bucket: str, value: int):
+    res = db.execute(
+        update(StatsCounter)
+        .where(StatsCounter.name == name, StatsCounter.bucket == bucket)
+        .values(value=value, updatedAt=datetime.utcnow())
+    )
+    if not res.rowcount:
+        db.add(StatsCounter(name=name, bucket=bucket, value=value))
+
+
+def acquire_reconcile_lease(db: Session, now: int, seconds: int) -> bool:
+    """租约已过期（或不存在）时续到 now + seconds 并返回 True；调用方负责提交。"""
+    res = db.execute(
+        update(StatsCounter)
+        .where(StatsCounter.name == RECONCILE_LEASE, StatsCounter.bucket == TOTAL, StatsCounter.value <= now)
+        .values(value=now + seconds, updatedAt=datetime.utcnow())
+    )
+    if res.rowcount:
+        return True
+    if db.execute(
+        select(StatsCounter.name).where(StatsCounter.name == RECONCILE_LEASE, StatsCounter.bucket == TOTAL)
+    ).first():
+        return False
+    try:
+        with db.begin_nested():
+            db.add(StatsCounter(name=RECONCILE_LEASE, bucket=TOTAL, value=now + seconds))
+        return True
+    except IntegrityError:
+        # 另一个 worker 同时插入了租约行
+        return False
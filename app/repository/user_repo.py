@@ -1,8 +1,11 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from typing import Iterable, Iterator, Set
+from sqlalchemy import or_, select
 from app.models import User
+from app.repository import stats_repo
 from app.schemas import RegisterIn
-from app.core.security import hash_password
+from app.utils.pagination import keyset_page, split_page
 from datetime import datetime
 
 
@@ -20,26 +23,34 @@ def get_user_by_username_or_email(db: Session, username: str, email: str) -> Use
     ).first()
 
 
-def create_user(db: Session, data: RegisterIn, uid: int, now: datetime) -> User:
+def existing_uids(db: Session, uids: Iterable[int]) -> Set[int]:
+    uids = list(uids)
+    if not uids:
+        return set()
+    return set(db.execute(select(User.uid).where(User.uid.in_(uids))).scalars().all())
+
+
+def create_user(db: Session, data: RegisterIn, uid: int, now: datetime, password_hash: str) -> User:
     u = User(
         username=data.username.strip(),
         email=data.email.strip().lower(),
         uid=uid,
         createdAt=now,
         updatedAt=now,
-        passwordHash=hash_password(data.password)
+        passwordHash=password_hash
     )
     db.add(u)
+    stats_repo.record_user(db, now)
     return u
 
 
-def list_users(db: Session, page: int, page_size: int):
-    q = db.query(User)
-    total = q.count()
-    items = (
-        q.order_by(User.createdAt.desc())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-        .all()
-    )
-    return items, total
+async def list_users_async(db: AsyncSession, page: int, page_size: int, cursor: str | None = None):
+    stmt = keyset_page(select(User), User.createdAt, User.uid, page, page_size, cursor)
+    rows = list((await db.execute(stmt)).scalars().all())
+    items, next_cursor = split_page(rows, page_size, "createdAt", "uid")
+    return items, next_cursor
+
+
+def iter_users(db: Session, batch_size: int) -> Iterator[User]:
+    stmt = select(User).order_by(User.uid).execution_options(yield_per=batch_size)
+    return iter(db.scalars(stmt))
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, delete
 from app.models import VerificationCode
 from datetime import datetime
 
@@ -39,4 +39,22 @@ def create_or_update_code(
 
 def delete_code(db: Session, vc: VerificationCode):
 
-    db.delete(vc)
\ No newline at end of file
+    db.delete(vc)
+
+
+def consume_code(db: Session, email: str, vcode_type: str, code: str, now: datetime) -> bool:
+    # 校验与删除在一条 DELETE 中完成，同一验证码并发提交时只有一个请求成功
+    res = db.execute(
+        delete(VerificationCode).where(
+            VerificationCode.email == email,
+            VerificationCode.type == vcode_type,
+            VerificationCode.code == code,
+            VerificationCode.expires_at >= now
+        )
+    )
+    return res.rowcount == 1
+
+
+def purge_expired(db: Session, before: datetime) -> int:
+    res = db.execute(delete(VerificationCode).where(VerificationCode.expires_at < before))
+    return res.rowcount
\ No newline at end of file
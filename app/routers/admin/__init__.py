@@ -1,22 +1,27 @@
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.core.security import get_current_admin
+from app.core.security import Principal, get_current_admin, get_current_admin_async
 from app.core.response import ok
-from app.db.session import get_db
-from app.models import User
+from app.core.config import settings
+from app.db.session import SessionLocal, get_db
+from app.db.async_session import get_async_db
 from app.services.stats_service import StatsService
+from app.services import count_service, export_service, mail_queue, project_cache
+from app.models import Registration, User, Project
 from app.services.registration_service import RegistrationService
-from app.services.user_service import UserService
 from app.core.response import err
 from fastapi import status, Query
-from app.schemas import RegistrationOut, PublicUser, ProjectOut, ProjectUpdate, AdminRegistrationCreate
-from app.repository import registration_repo
+from app.schemas import RegistrationOut, PublicUser, ProjectOut, ProjectUpdate, AdminRegistrationCreate, RegistrationBulkAudit
+from app.repository import registration_repo, user_repo
 from app.repository import project_repo
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 @router.get("/ping")
-def admin_ping(current_admin: User = Depends(get_current_admin)):
+def admin_ping(current_admin: Principal = Depends(get_current_admin)):
     return ok({"pong": True})
 
 
@@ -25,8 +30,56 @@ def get_stats_service(db: Session = Depends(get_db)) -> StatsService:
 
 
 @router.get("/stats")
-def get_stats(current_admin: User = Depends(get_current_admin), stats: StatsService = Depends(get_stats_service)):
-    return ok(stats.get_counts())
+def get_stats(
+    days: int = Query(settings.STATS_DAILY_DAYS, ge=1, le=366),
+    current_admin: Principal = Depends(get_current_admin),
+    stats: StatsService = Depends(get_stats_service)
+):
+    return ok(stats.get_counts(days))
+
+
+@router.post("/stats/reconcile")
+def reconcile_stats(current_admin: Principal = Depends(get_current_admin), stats: StatsService = Depends(get_stats_service)):
+    return ok({"drift": stats.reconcile()})
+
+
+def _export_response(kind: str, fmt: str, body) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type=export_service.EXPORT_MEDIA_TYPES[fmt],
+        headers={"content-disposition": f'attachment; filename="{export_service.filename(kind, fmt)}"'},
+    )
+
+
+@router.get("/export/registrations")
+def export_registrations(
+    format_: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    status_: str | None = Query(None, alias="status"),
+    current_admin: Principal = Depends(get_current_admin),
+):
+    return _export_response("registrations", format_, export_service.export_registrations(format_, status_))
+
+
+@router.get("/export/users")
+def export_users(
+    format_: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    current_admin: Principal = Depends(get_current_admin),
+):
+    return _export_response("users", format_, export_service.export_users(format_))
+
+
+@router.get("/export/projects")
+def export_projects(
+    format_: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    uid: int | None = Query(None),
+    current_admin: Principal = Depends(get_current_admin),
+):
+    return _export_response("projects", format_, export_service.export_projects(format_, uid))
+
+
+@router.get("/mail/metrics")
+def get_mail_metrics(current_admin: Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
+    return ok(mail_queue.get_metrics(db))
 
 
 def get_reg_service(db: Session = Depends(get_db)) -> RegistrationService:
@@ -34,39 +87,80 @@ def get_reg_service(db: Session = Depends(get_db)) -> RegistrationService:
 
 
 @router.get("/registrations")
-def list_registrations(
+async def list_registrations(
     status: str | None = Query(None),
     page: int = Query(1, ge=1),
-    current_admin: User = Depends(get_current_admin),
-    reg_service: RegistrationService = Depends(get_reg_service)
+    cursor: str | None = Query(None),
+    current_admin: Principal = Depends(get_current_admin_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    data = reg_service.get_all_registrations(status, page)
-    data["items"] = [RegistrationOut.model_validate(r).model_dump() for r in data["items"]]
-    return ok(data)
+    page_size = 20
+    try:
+        items, next_cursor = await registration_repo.list_registrations_async(db, status, page, page_size, cursor)
+    except ValueError as e:
+        return err(str(e), code=40009, status_code=400)
+    total, total_is_estimate = await count_service.count_async(db, Registration, {"status": status})
+    return ok({
+        "items": [RegistrationOut.model_validate(r) for r in items],
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+        "page": page,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+    })
 
 
 @router.get("/registrations/{registrationId}")
 def get_registration_detail(
     registrationId: int,
-    current_admin: User = Depends(get_current_admin),
+    current_admin: Principal = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
     r = registration_repo.get_registration_by_id(db, registrationId, eager_load=True)
     if not r:
         return err("报名不存在", code=40403, status_code=status.HTTP_404_NOT_FOUND)
-    return ok(RegistrationOut.model_validate(r).model_dump())
+    return ok(RegistrationOut.model_validate(r))
 
 
 @router.put("/registrations/{registrationId}/audit")
 def audit_registration(
     registrationId: int,
     status_: str = Query(..., alias="status"),
-    current_admin: User = Depends(get_current_admin),
+    current_admin: Principal = Depends(get_current_admin),
     reg_service: RegistrationService = Depends(get_reg_service)
 ):
     try:
         r = reg_service.audit_registration(registrationId, status_)
-        return ok(RegistrationOut.model_validate(r).model_dump())
+        return ok(RegistrationOut.model_validate(r))
+    except ValueError as e:
+        return err(str(e), code=40007, status_code=status.HTTP_400_BAD_REQUEST)
+
+
+def _bulk_audit_stream(body: RegistrationBulkAudit):
+    # 流式响应在依赖注入的会话关闭后才开始迭代，需自行管理会话
+    db = SessionLocal()
+    try:
+        for step in RegistrationService(db).bulk_audit_steps(body, chunk_size=settings.BULK_AUDIT_CHUNK_SIZE):
+            yield to_json(step) + b"\n"
+    except Exception as e:
+        detail = getattr(e, "detail", None) or str(e)
+        yield to_json({"type": "error", "message": detail}) + b"\n"
+    finally:
+        db.close()
+
+
+@router.post("/registrations/bulk-audit")
+def bulk_audit_registrations(
+    body: RegistrationBulkAudit,
+    stream: bool = Query(False),
+    current_admin: Principal = Depends(get_current_admin),
+    reg_service: RegistrationService = Depends(get_reg_service)
+):
+    try:
+        RegistrationService.validate_bulk_audit(body)
+        if stream:
+            return StreamingResponse(_bulk_audit_stream(body), media_type="application/x-ndjson")
+        return ok(reg_service.bulk_audit(body))
     except ValueError as e:
         return err(str(e), code=40007, status_code=status.HTTP_400_BAD_REQUEST)
 
@@ -74,7 +168,7 @@ def audit_registration(
 @router.delete("/registrations/{registrationId}")
 def delete_registration(
     registrationId: int,
-    current_admin: User = Depends(get_current_admin),
+    current_admin: Principal = Depends(get_current_admin),
     reg_service: RegistrationService = Depends(get_reg_service)
 ):
     try:
@@ -90,12 +184,12 @@ def delete_registration(
 def update_registration(
     registrationId: int,
     note: str = Query(..., min_length=1, max_length=100000),
-    current_admin: User = Depends(get_current_admin),
+    current_admin: Principal = Depends(get_current_admin),
     reg_service: RegistrationService = Depends(get_reg_service)
 ):
     try:
         r = reg_service.update_registration_note(registrationId, note)
-        return ok(RegistrationOut.model_validate(r).model_dump())
+        return ok(RegistrationOut.model_validate(r))
     except NotFoundError as e:
         return err(str(e), code=40403, status_code=status.HTTP_404_NOT_FOUND)
     except Exception as e:
@@ -105,71 +199,79 @@ def update_registration(
 @router.post("/registrations")
 def admin_create_registration(
     body: AdminRegistrationCreate,
-    current_admin: User = Depends(get_current_admin),
+    current_admin: Principal = Depends(get_current_admin),
     reg_service: RegistrationService = Depends(get_reg_service)
 ):
     try:
         r = reg_service.admin_create_registration(body)
-        return ok(RegistrationOut.model_validate(r).model_dump())
+        return ok(RegistrationOut.model_validate(r))
     except (ForbiddenError, ConflictError, NotFoundError) as e:
         return err(str(e), code=40008, status_code=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return err(str(e), code=50006, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def get_user_service(db: Session = Depends(get_db)) -> UserService:
-    return UserService(db)
-
-
 @router.get("/users")
-def list_users(
+async def list_users(
     page: int = Query(1, ge=1),
-    current_admin: User = Depends(get_current_admin),
-    user_service: UserService = Depends(get_user_service)
+    cursor: str | None = Query(None),
+    current_admin: Principal = Depends(get_current_admin_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    data = user_service.get_all_users(page)
-    data["items"] = [PublicUser.model_validate(u).model_dump() for u in data["items"]]
-    return ok(data)
+    page_size = 20
+    try:
+        items, next_cursor = await user_repo.list_users_async(db, page, page_size, cursor)
+    except ValueError as e:
+        return err(str(e), code=40009, status_code=status.HTTP_400_BAD_REQUEST)
+    total, total_is_estimate = await count_service.count_async(db, User)
+    return ok({
+        "items": [PublicUser.model_validate(u) for u in items],
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+        "page": page,
+        "page_size": page_size,
+        "next_cursor": next_cursor,
+    })
 
 
 # ---- Admin Project CRUD ----
 
 @router.get("/projects")
-def admin_list_projects(
+async def admin_list_projects(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    cursor: str | None = Query(None),
+    current_admin: Principal = Depends(get_current_admin_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    q = db.query(project_repo.Project)
-    total = q.count()
-    items = (
-        q.order_by(project_repo.Project.createdAt.desc())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-        .all()
-    )
+    try:
+        items, next_cursor = await project_repo.list_projects_async(db, page, page_size, cursor)
+    except ValueError as e:
+        return err(str(e), code=40009, status_code=status.HTTP_400_BAD_REQUEST)
+    total, total_is_estimate = await count_service.count_async(db, Project)
     return ok({
-        "items": [ProjectOut.model_validate(p).model_dump() for p in items],
+        "items": [ProjectOut.model_validate(p) for p in items],
         "total": total,
+        "total_is_estimate": total_is_estimate,
         "page": page,
         "page_size": page_size,
+        "next_cursor": next_cursor,
     })
 
 
 @router.get("/projects/{projectId}")
-def admin_get_project(projectId: int, current_admin: User = Depends(get_current_admin), db: Session = Depends(get_db)):
+def admin_get_project(projectId: int, current_admin: Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
     p = project_repo.get_project_by_id(db, projectId)
     if not p:
         return err("项目不存在", code=40404, status_code=status.HTTP_404_NOT_FOUND)
-    return ok(ProjectOut.model_validate(p).model_dump())
+    return ok(ProjectOut.model_validate(p))
 
 
 @router.put("/projects/{projectId}")
 def admin_update_project(
     projectId: int,
     body: ProjectUpdate,
-    current_admin: User = Depends(get_current_admin),
+    current_admin: Principal = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
     p = project_repo.get_project_by_id(db, projectId)
@@ -178,21 +280,25 @@ def admin_update_project(
     try:
         project_repo.update_project(db, p, title=body.title, description=body.description, repoUrl=body.repoUrl, demoUrl=body.demoUrl)
         db.commit()
+        project_cache.invalidate(project_id=projectId, uid=p.uid)
         db.refresh(p)
-        return ok(ProjectOut.model_validate(p).model_dump())
+        return ok(ProjectOut.model_validate(p))
     except Exception as e:
         db.rollback()
         return err(f"更新失败: {e}", code=50004, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @router.delete("/projects/{projectId}")
-def admin_delete_project(projectId: int, current_admin: User = Depends(get_current_admin), db: Session = Depends(get_db)):
+def admin_delete_project(projectId: int, current_admin: Principal = Depends(get_current_admin), db: Session = Depends(get_db)):
     p = project_repo.get_project_by_id(db, projectId)
     if not p:
         return err("项目不存在", code=40404, status_code=status.HTTP_404_NOT_FOUND)
     try:
+        uid = p.uid
         project_repo.delete_project(db, p)
         db.commit()
+        project_cache.invalidate(project_id=projectId, uid=uid)
+        count_service.invalidate(Project)
         return ok({"deleted": True})
     except Exception as e:
         db.rollback()
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.db.session import get_db
-from app.core.security import get_current_user
+from app.db.async_session import get_async_db
+from app.core.security import Principal, get_current_user, get_current_user_async
 from app.core.response import ok, err
-from app.models import User
 from app.schemas import ProjectIn, ProjectOut
+from app.repository import project_repo
+from app.services import project_cache
+from app.utils.http import conditional_response
 from app.services.project_service import ProjectService, NotFoundError, ForbiddenError, ConflictError
-from typing import List
 
 router = APIRouter(prefix="/project", tags=["project"])
 
@@ -18,32 +21,36 @@ def get_project_service(db: Session = Depends(get_db)) -> ProjectService:
 @router.post("")
 def create_project(
     data: ProjectIn,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     project_service: ProjectService = Depends(get_project_service)
 ):
     try:
         new_project = project_service.create_project(data, current_user)
-        return ok(ProjectOut.model_validate(new_project).model_dump())
+        return ok(ProjectOut.model_validate(new_project))
     except (NotFoundError, ForbiddenError, ConflictError) as e:
         return err(str(e), code=40004, status_code=status.HTTP_400_BAD_REQUEST)
 
 
 @router.get("/my")
-def list_my_projects(
-    current_user: User = Depends(get_current_user),
-    project_service: ProjectService = Depends(get_project_service)
+async def list_my_projects(
+    request: Request,
+    current_user: Principal = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    projects = project_service.get_my_projects(current_user)
-    return ok([ProjectOut.model_validate(p).model_dump() for p in projects])
+    body, etag = await project_cache.get_mine(
+        current_user.uid, lambda: project_repo.get_projects_by_uid_async(db, current_user.uid)
+    )
+    return conditional_response(request, body, etag, "private, no-cache")
 
 
 @router.get("/{projectId}")
-def get_project_detail(
+async def get_project_detail(
     projectId: int,
-    project_service: ProjectService = Depends(get_project_service)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    try:
-        project = project_service.get_project_details(projectId)
-        return ok(ProjectOut.model_validate(project).model_dump())
-    except NotFoundError as e:
-        return err(str(e), code=40401, status_code=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+    cached = await project_cache.get_detail(projectId, lambda: project_repo.get_project_by_id_async(db, projectId))
+    if not cached:
+        return err("项目不存在", code=40401, status_code=status.HTTP_404_NOT_FOUND)
+    body, etag = cached
+    return conditional_response(request, body, etag, "public, no-cache")
\ No newline at end of file
@@ -1,12 +1,23 @@
-from fastapi import APIRouter, Depends, status
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.db.session import get_db
-from app.core.security import get_current_user
+from app.db.async_session import get_async_db
+from app.core.security import (
+    Principal, create_token, get_current_user, get_current_user_async, ticket_uid_async, token_version_async,
+)
+from app.core.config import settings
 from app.core.response import ok, err
-from app.models import User
 from app.schemas import RegistrationIn, RegistrationOut
+from app.repository import registration_repo
+from app.services import event_broker, registration_cache
 from app.services.registration_service import RegistrationService
 from app.services.project_service import NotFoundError, ForbiddenError, ConflictError
+from app.utils.http import conditional_response, etag_matches
 
 router = APIRouter(prefix="/registration", tags=["registration"])
 
@@ -18,12 +29,12 @@ def get_reg_service(db: Session = Depends(get_db)) -> RegistrationService:
 @router.post("")
 def create_registration(
         data: RegistrationIn,
-        current_user: User = Depends(get_current_user),
+        current_user: Principal = Depends(get_current_user),
         reg_service: RegistrationService = Depends(get_reg_service)
 ):
     try:
         reg = reg_service.create_registration(data, current_user)
-        return ok(RegistrationOut.model_validate(reg).model_dump())
+        return ok(RegistrationOut.model_validate(reg))
     except ConflictError as e:
         return err(str(e), code=40903, status_code=status.HTTP_409_CONFLICT)
     except (NotFoundError, ForbiddenError) as e:
@@ -31,12 +42,109 @@ def create_registration(
 
 
 @router.get("/status")
-def get_registration_status(
-    current_user: User = Depends(get_current_user),
-    reg_service: RegistrationService = Depends(get_reg_service)
+async def get_registration_status(
+    request: Request,
+    wait: int = Query(0, ge=0, le=settings.REGISTRATION_STATUS_MAX_WAIT_SECONDS),
+    current_user: Principal = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    """
+    前端轮询用：命中缓存时不查库；带 If-None-Match 且未变化时返回 304。
+    传 wait=N 时为长轮询，状态未变化则最多挂起 N 秒，变化后立即返回新快照。
+    """
+    uid = current_user.uid
+
+    def load():
+        return registration_repo.get_registration_by_uid_async(db, uid)
+
+    cached = await registration_cache.get_status(uid, load)
+    if_none_match = request.headers.get("if-none-match")
+    if wait and cached is not None and if_none_match is not None and etag_matches(if_none_match, cached[1]):
+        # 挂起期间不占用连接池中的连接
+        await db.close()
+        cached = await registration_cache.wait_for_change(uid, cached[1], wait, load)
+    if cached is None:
+        return err("尚未提交报名", code=40402, status_code=status.HTTP_404_NOT_FOUND)
+    body, etag = cached
+    return conditional_response(request, body, etag, "private, no-cache")
+
+
+def _sse(event: event_broker.Event) -> str:
+    data = json.dumps(event["data"], ensure_ascii=False, default=str)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+async def _event_stream(uid: int, resume: Optional[str]):
+    broker = event_broker.get_broker()
+    # 先订阅再补发历史，补发期间产生的事件留在队列中，按 id 去重
+    sub = broker.subscribe(uid)
     try:
-        reg = reg_service.get_status(current_user)
-        return ok(RegistrationOut.model_validate(reg).model_dump())
-    except NotFoundError as e:
-        return err(str(e), code=40402, status_code=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        yield f"retry: {settings.EVENTS_HEARTBEAT_SECONDS * 1000}\n\n"
+        last = None
+        if resume:
+            for event in await broker.history(uid, resume):
+                yield _sse(event)
+                last = event_broker.event_key(event["id"])
+        while True:
+            try:
+                event = await sub.get(timeout=settings.EVENTS_HEARTBEAT_SECONDS)
+            except TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event is None:
+                # 消费过慢被断开，客户端会带 Last-Event-ID 自动重连并补齐
+                return
+            key = event_broker.event_key(event["id"])
+            if last is not None and key <= last:
+                continue
+            yield _sse(event)
+            last = key
+    finally:
+        broker.unsubscribe(sub)
+
+
+@router.post("/events/ticket")
+async def registration_events_ticket(
+    current_user: Principal = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    换取 /registration/events 的短期票据。EventSource 无法设置请求头，票据放在 ?ticket= 中；
+    票据只能用于建立事件流，过期后重新换取并带上 last_event_id 续传。
+    """
+    ver = await token_version_async(db, current_user.uid)
+    ticket = create_token(str(current_user.uid), minutes=settings.EVENTS_TICKET_TTL_SECONDS / 60, kind="sse", version=ver)
+    return ok({"ticket": ticket, "expires_in": settings.EVENTS_TICKET_TTL_SECONDS})
+
+
+@router.get("/events")
+async def registration_events(
+    request: Request,
+    ticket: Optional[str] = Query(None, description="POST /registration/events/ticket 换取的短期票据"),
+    last_event_id: Optional[str] = Query(None),
+    authorization: Optional[str] = Header(None, alias="Authorization"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    报名状态变更的 SSE 推送：事件类型为 registration，data 含 registrationId/status/previous。
+    断线重连时浏览器自动带上 Last-Event-ID，从保留的历史中补发错过的事件；空闲时定期发送心跳注释。
+    鉴权使用 Authorization 头或 ?ticket=，不接受放在 URL 中的 access token。
+    """
+    if authorization is None and ticket:
+        uid = await ticket_uid_async(ticket, "sse", db)
+    else:
+        uid = (await get_current_user_async(authorization, db)).uid
+    # 长连接期间不占用连接池中的连接
+    await db.close()
+
+    resume = request.headers.get("last-event-id") or last_event_id
+    if resume:
+        try:
+            event_broker.event_key(resume)
+        except ValueError:
+            resume = None
+    return StreamingResponse(
+        _event_stream(uid, resume),
+        media_type="text/event-stream",
+        headers={"cache-control": "no-cache", "x-accel-buffering": "no"},
+    )
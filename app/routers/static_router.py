@@ -0,0 +1,117 @@
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request
+from starlette.responses import FileResponse, Response
+
+from app.core.config import settings
+from app.services.upload_service import BLOB_DIR
+from app.services.thumbnail_service import THUMB_DIR
+from app.utils.http import etag_matches
+
+router = APIRouter(prefix="/static", tags=["static"])
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+
+class LargeChunkFileResponse(FileResponse):
+    """FileResponse 默认按 64KB 读取，上传文件多为图片/PDF，加大块以减少线程切换。"""
+
+    chunk_size = 256 * 1024
+
+
+class ZeroCopyFileResponse(Response):
+    """
+    仅在服务器通过 scope["extensions"] 声明支持 ASGI zero-copy 扩展时使用：把文件描述符交给服务器 sendfile。
+    只处理完整的 GET 响应；Range / HEAD 以及不支持该扩展的服务器（uvicorn、hypercorn 等）仍走 FileResponse。
+    """
+
+    def __init__(self, path: str, stat_result: os.stat_result, headers: dict, media_type: str):
+        super().__init__(
+            headers={**headers, "content-length": str(stat_result.st_size), "accept-ranges": "bytes"},
+            media_type=media_type,
+        )
+        self.path = path
+        self.size = stat_result.st_size
+
+    async def __call__(self, scope, receive, send):
+        with open(self.path, "rb") as f:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await send({"type": ZEROCOPY_EXTENSION, "file": f.fileno(), "offset": 0, "count": self.size, "more_body": False})
+
+
+def _supports_zerocopy(request: Request) -> bool:
+    return (
+        ZEROCOPY_EXTENSION in request.scope.get("extensions", {})
+        and request.method == "GET"
+        and "range" not in request.headers
+    )
+
+
+def _resolve(file_path: str) -> str:
+    root = os.path.realpath(settings.UPLOAD_DIR)
+    # 隐藏目录（如上传用的 blobs/.tmp）不对外暴露
+    if any(part.startswith(".") for part in file_path.split("/")):
+        raise HTTPException(status_code=404, detail="文件不存在")
+    full = os.path.realpath(os.path.join(root, file_path))
+    if not full.startswith(root + os.sep):
+        raise HTTPException(status_code=404, detail="文件不存在")
+    return full
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@router.api_route("/{file_path:path}", methods=["GET", "HEAD"])
+async def serve_static(file_path: str, request: Request):
+    full_path = _resolve(file_path)
+    try:
+        stat_result = await anyio.to_thread.run_sync(os.stat, full_path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="文件不存在")
+    if not os.path.isfile(full_path):
+        raise HTTPException(status_code=404, detail="文件不存在")
+
+    # blobs/thumbs 下的文件名即内容哈希：ETag 与 Attachment.etag 一致，且内容永不变化
+    if file_path.startswith((BLOB_DIR + "/", THUMB_DIR + "/")):
+        etag = '"' + os.path.basename(full_path).split(".", 1)[0] + '"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+        cache_control = REVALIDATE_CACHE_CONTROL
+
+    headers = {
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "cache-control": cache_control,
+    }
+    if _not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    if settings.STATIC_SERVE_MODE == "accel":
+        # 由前置代理（nginx internal location）负责发送文件内容及 Range
+        headers["x-accel-redirect"] = settings.STATIC_ACCEL_PREFIX.rstrip("/") + "/" + quote(file_path)
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        return Response(headers=headers, media_type=media_type)
+
+    if _supports_zerocopy(request):
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        return ZeroCopyFileResponse(full_path, stat_result, headers, media_type)
+    return LargeChunkFileResponse(full_path, headers=headers, stat_result=stat_result)
@@ -1,9 +1,8 @@
-from fastapi import APIRouter, UploadFile, File, Depends, Query
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Depends, Query
 from sqlalchemy.orm import Session
 from app.core.response import ok
-from app.core.security import get_current_user
+from app.core.security import Principal, get_current_user
 from app.db.session import get_db
-from app.models import User
 from typing import Literal
 from app.services.upload_service import UploadService
 
@@ -16,13 +15,14 @@ def get_upload_service(db: Session = Depends(get_db)) -> UploadService:
 
 @router.post("/image")
 async def upload_file(
+        background: BackgroundTasks,
         file: UploadFile = File(...),
         context: Literal["registration", "project"] = Query(...),
-        current_user: User = Depends(get_current_user),
+        current_user: Principal = Depends(get_current_user),
         upload_service: UploadService = Depends(get_upload_service)
 ):
 
-    new_attachment, size = await upload_service.save_file(file, context, current_user)
+    new_attachment, size = await upload_service.save_file(file, context, current_user, background)
 
     return ok({
         "attachment_id": new_attachment.id,
@@ -30,5 +30,6 @@ async def upload_file(
         "size": size,
         "mime": new_attachment.mimeType,
         "key": new_attachment.key,
+        "etag": new_attachment.etag,
         "originalFilename": new_attachment.originalFilename
     })
\ No newline at end of file
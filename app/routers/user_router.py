@@ -1,8 +1,7 @@
 from fastapi import APIRouter, Depends, status
 from sqlalchemy.orm import Session
 from app.db.session import get_db
-from app.models import User
-from app.core.security import get_current_user
+from app.core.security import Principal, get_current_user
 from app.core.response import ok, err
 from app.schemas import UpdateProfile, MeProfile
 from app.services.user_service import UserService, ConflictError
@@ -15,20 +14,20 @@ def get_user_service(db: Session = Depends(get_db)) -> UserService:
 
 
 @router.get("/profile")
-def get_profile(current_user: User = Depends(get_current_user)):
-    profile_data = MeProfile.model_validate(current_user).model_dump()
+def get_profile(current_user: Principal = Depends(get_current_user)):
+    profile_data = MeProfile.model_validate(current_user.user)
     return ok(profile_data)
 
 
 @router.put("/profile")
 def update_profile(
     profile: UpdateProfile, 
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     user_service: UserService = Depends(get_user_service)
 ):
     try:
-        updated_user = user_service.update_profile(current_user, profile)
-        profile_data = MeProfile.model_validate(updated_user).model_dump()
+        updated_user = user_service.update_profile(current_user.user, profile)
+        profile_data = MeProfile.model_validate(updated_user)
         return ok(profile_data)
     except ConflictError as e:
         return err(str(e), code=40902, status_code=status.HTTP_409_CONFLICT)
\ No newline at end of file
@@ -1,4 +1,4 @@
 from .user_schema import PublicUser, MeProfile, UpdateProfile
 from .auth_schema import TokenPair, RefreshIn, RegisterIn, LoginIn, ResetPasswordIn, SendCodeIn
-from .registration_schema import RegistrationIn, RegistrationOut, AdminRegistrationCreate
+from .registration_schema import RegistrationIn, RegistrationOut, AdminRegistrationCreate, RegistrationBulkAudit
 from .project_schema import ProjectIn, ProjectOut, ProjectUpdate
@@ -8,6 +8,10 @@ class AttachmentOut(BaseModel):
     url: str
     originalFilename: Optional[str]
     mimeType: Optional[str]
+    etag: Optional[str] = None
+    thumbnailUrl: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
     createdAt: datetime
 
     class Config:
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional, List
-from pydantic import BaseModel, constr
+from pydantic import BaseModel, Field, constr
 from .attachment_schema import AttachmentOut
 
 
@@ -22,6 +22,13 @@ class RegistrationOut(BaseModel):
         from_attributes = True
 
 
+class RegistrationBulkAudit(BaseModel):
+    status: str
+    # 二选一：指定报名 ID 列表，或按当前状态批量审核
+    ids: Optional[List[int]] = Field(default=None, max_length=10000)
+    filter_status: Optional[str] = None
+
+
 class AdminRegistrationCreate(BaseModel):
     uid: int
     note: constr(max_length=100000)
@@ -1,5 +1,5 @@
+from typing import Iterable, List
 from sqlalchemy.orm import Session
-from app.models.attachment_model import Attachment
 from app.repository import attachment_repo
 
 
@@ -20,17 +20,55 @@ class AttachmentService:
     def __init__(self, db: Session):
         self.db = db
 
-    def validate_and_get_attachment(self, att_id: int, user_id: int) -> Attachment:
+    def validate_and_claim_many(self, att_ids: Iterable[int], user_id: int, *,
+                                project_id: int | None = None, registration_id: int | None = None) -> int:
+        """
+        批量校验并认领附件：一次 IN 查询加载全部附件，所有问题 ID 一并报告；
+        校验通过后用一条带 IS NULL 条件的 UPDATE 完成关联。返回认领的附件数。
+        抛出的异常类型按 未找到 > 无权 > 已被使用 的优先级选择，消息中包含全部问题。
+        """
+        if (project_id is None) == (registration_id is None):
+            raise ValueError("project_id 与 registration_id 必须且只能指定一个")
+        ids = list(dict.fromkeys(att_ids))
+        if not ids:
+            return 0
 
-        attachment = attachment_repo.get_attachment_by_id(self.db, att_id)
+        found = {a.id: a for a in attachment_repo.get_attachments_by_ids(self.db, ids)}
+        not_found = [i for i in ids if i not in found]
+        forbidden = [i for i in ids if i in found and found[i].uploadedByUid != user_id]
+        conflict = [
+            i for i in ids
+            if i in found and found[i].uploadedByUid == user_id
+            and (found[i].projectId is not None or found[i].registrationId is not None)
+        ]
+        self._raise_for(not_found, forbidden, conflict)
 
-        if not attachment:
-            raise NotFoundError(f"附件 {att_id} 未找到")
+        claimed = attachment_repo.claim_attachments(
+            self.db, ids, user_id, project_id=project_id, registration_id=registration_id
+        )
+        if claimed != len(ids):
+            # 校验之后被并发请求抢先认领；调用方回滚整个事务
+            raise ConflictError(f"附件 {_join(ids)} 中有附件已被使用")
+        return claimed
 
-        if attachment.uploadedByUid != user_id:
-            raise ForbiddenError(f"无权使用附件 {att_id}")
+    @staticmethod
+    def _raise_for(not_found: List[int], forbidden: List[int], conflict: List[int]):
+        messages = []
+        if not_found:
+            messages.append(f"附件 {_join(not_found)} 未找到")
+        if forbidden:
+            messages.append(f"无权使用附件 {_join(forbidden)}")
+        if conflict:
+            messages.append(f"附件 {_join(conflict)} 已被使用")
+        if not messages:
+            return
+        message = "；".join(messages)
+        if not_found:
+            raise NotFoundError(message)
+        if forbidden:
+            raise ForbiddenError(message)
+        raise ConflictError(message)
 
-        if attachment.projectId is not None or attachment.registrationId is not None:
-            raise ConflictError(f"附件 {att_id} 已被使用")
 
-        return attachment
\ No newline at end of file
+def _join(ids: Iterable[int]) -> str:
+    return ", ".join(str(i) for i in ids)
@@ -1,14 +1,18 @@
-from fastapi import BackgroundTasks, HTTPException
+from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime
 import random
 
 from app.core.config import settings
-from app.core.security import verify_password, hash_password, create_token
-from app.core.mail import send_verification_code
+from app.core.security import create_token, access_claims, revoke_tokens, forget_token_version
+from app.core.hashing import hash_password_async, verify_password_async
+from app.core.mail import verification_code_mail
 from app.models import User
-from app.repository import user_repo, vcode_repo
+from app.repository import user_repo, mail_repo
 from app.utils.uid import generate_uid
+from app.services import count_service, mail_queue
+from app.services.vcode_store import get_vcode_store
 from app.schemas import RegisterIn, LoginIn, ResetPasswordIn, TokenPair
 
 
@@ -35,85 +39,110 @@ class AuthService:
             raise e
         raise HTTPException(status_code=500, detail=f"数据库操作失败: {str(e)}")
 
-    def send_verification_code(self, email: str, vcode_type: str, background: BackgroundTasks):
+    async def send_verification_code(self, email: str, vcode_type: str):
+        ttl_seconds = settings.VERIFICATION_CODE_EXPIRE_MINUTES * 60
+        registered = await run_in_threadpool(user_repo.get_user_by_email, self.db, email)
         if vcode_type == "register":
-            if user_repo.get_user_by_email(self.db, email):
+            if registered:
                 raise ConflictError("该邮箱已被注册")
         elif vcode_type == "reset":
-            if not user_repo.get_user_by_email(self.db, email):
-                return settings.VERIFICATION_CODE_EXPIRE_MINUTES * 60
+            if not registered:
+                return ttl_seconds
 
-        now = datetime.utcnow()
-        ttl_minutes = settings.VERIFICATION_CODE_EXPIRE_MINUTES
-        min_interval = settings.VERIFICATION_CODE_MIN_INTERVAL_SECONDS
-
-        vc = vcode_repo.get_code(self.db, email, vcode_type)
-        last = vc.last_send_at if vc else None
-
-        if last and (now - last).total_seconds() < min_interval:
+        code = f"{random.randint(100000, 999999)}"
+        store = get_vcode_store()
+        if not await store.issue(email, vcode_type, code, ttl_seconds, settings.VERIFICATION_CODE_MIN_INTERVAL_SECONDS):
             raise ForbiddenError("请勿频繁发送验证码")  # 429
 
-        code = f"{random.randint(100000, 999999)}"
-        expires_at = now + timedelta(minutes=ttl_minutes)
+        await run_in_threadpool(self._enqueue_code_mail, email, code)
+        mail_queue.notify()
+        return ttl_seconds
 
+    def _enqueue_code_mail(self, email: str, code: str):
         try:
-            vcode_repo.create_or_update_code(self.db, vc, email, vcode_type, code, expires_at, now)
+            subject, body = verification_code_mail(code)
+            mail_repo.enqueue_mail(self.db, email, subject, body)
             self.db.commit()
         except Exception as e:
             self._handle_db_exception(e)
 
-        background.add_task(send_verification_code, email, code)
-        return ttl_minutes * 60
-
-    def register_user(self, data: RegisterIn) -> User:
+    async def register_user(self, data: RegisterIn) -> User:
         now = datetime.utcnow()
-        vc = vcode_repo.get_code(self.db, data.email, "register")
-
-        if not vc or vc.code != data.verification_code or (vc.expires_at < now):
+        store = get_vcode_store()
+        await run_in_threadpool(self._check_register, data)
+        if not await store.check(data.email, "register", data.verification_code):
             raise AuthError("验证码错误或已过期")
+        password_hash = await hash_password_async(data.password)
+        # 验证码在写入前的最后一步才消费，写入失败时放回，避免 503、唯一约束冲突等让验证码作废
+        if not await store.consume(data.email, "register", data.verification_code):
+            raise AuthError("验证码错误或已过期")
+        try:
+            return await run_in_threadpool(self._create_user, data, password_hash, now)
+        except Exception:
+            await self._restore_code(data.email, "register", data.verification_code)
+            raise
 
+    @staticmethod
+    async def _restore_code(email: str, vcode_type: str, code: str):
+        await get_vcode_store().restore(email, vcode_type, code, settings.VERIFICATION_CODE_EXPIRE_MINUTES * 60)
+
+    def _check_register(self, data: RegisterIn):
         if user_repo.get_user_by_username_or_email(self.db, data.username, data.email):
             raise ConflictError("用户名或邮箱已存在")
 
-        uid = generate_uid(self.db, int(now.timestamp()), "your_salt_here")
+    def _create_user(self, data: RegisterIn, password_hash: str, now: datetime) -> User:
+        uid = generate_uid()
 
         try:
-            user = user_repo.create_user(self.db, data, uid, now)
-            vcode_repo.delete_code(self.db, vc)
+            user = user_repo.create_user(self.db, data, uid, now, password_hash)
             self.db.commit()
+            count_service.invalidate(User)
             self.db.refresh(user)
             return user
         except Exception as e:
             self._handle_db_exception(e)
 
-    def login(self, data: LoginIn) -> TokenPair:
+    async def login(self, data: LoginIn) -> TokenPair:
         if not data.username and not data.email:
             raise ValueError("必须提供用户名或邮箱")
 
-        u = user_repo.get_user_by_username_or_email(self.db, data.username, data.email)
+        u = await run_in_threadpool(user_repo.get_user_by_username_or_email, self.db, data.username, data.email)
 
-        if not u or not verify_password(data.password, u.passwordHash):
+        if not u or not await verify_password_async(data.password, u.passwordHash):
             raise AuthError("用户名/邮箱或密码错误")
 
+        # 新令牌按数据库当前状态签发，同时丢弃本进程缓存的令牌版本与管理员标记，使权限变更在重新登录后立即生效
+        forget_token_version(u.uid)
         sub = str(u.uid)
-        access = create_token(sub, minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES, kind="access")
-        refresh = create_token(sub, minutes=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60, kind="refresh")
+        ver = u.tokenVersion
+        access = create_token(sub, minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES, kind="access", version=ver,
+                              claims=access_claims(u))
+        refresh = create_token(sub, minutes=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60, kind="refresh", version=ver)
         return TokenPair(access_token=access, refresh_token=refresh)
 
-    def reset_password(self, data: ResetPasswordIn):
+    async def reset_password(self, data: ResetPasswordIn):
         now = datetime.utcnow()
-        vc = vcode_repo.get_code(self.db, data.email, "reset")
-        if not vc or vc.code != data.verification_code or (vc.expires_at < now):
+        store = get_vcode_store()
+        if not await store.check(data.email, "reset", data.verification_code):
             raise AuthError("验证码错误或已过期")
-
-        user = user_repo.get_user_by_email(self.db, data.email)
+        user = await run_in_threadpool(user_repo.get_user_by_email, self.db, data.email)
         if not user:
             raise AuthError("用户不存在")  # 404
+        password_hash = await hash_password_async(data.new_password)
+        if not await store.consume(data.email, "reset", data.verification_code):
+            raise AuthError("验证码错误或已过期")
+        try:
+            await run_in_threadpool(self._apply_reset, user, password_hash, now)
+        except Exception:
+            await self._restore_code(data.email, "reset", data.verification_code)
+            raise
 
+    def _apply_reset(self, user: User, password_hash: str, now: datetime):
         try:
-            user.passwordHash = hash_password(data.new_password)
+            user.passwordHash = password_hash
             user.updatedAt = now
-            vcode_repo.delete_code(self.db, vc)
+            revoke_tokens(self.db, user.uid)
             self.db.commit()
         except Exception as e:
-            self._handle_db_exception(e)
\ No newline at end of file
+            self._handle_db_exception(e)
+        forget_token_version(user.uid)
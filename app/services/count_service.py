@@ -0,0 +1,68 @@
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# (表名, 过滤条件) -> (总数, 是否为估算值)
+_count_cache = TTLCache(maxsize=256, ttl=settings.COUNT_CACHE_TTL_SECONDS)
+
+_MYSQL_ESTIMATE_SQL = text(
+    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+)
+
+
+def _estimate(db: Session, table: str) -> Optional[int]:
+    # 仅 MySQL(InnoDB) 有廉价的表统计信息，其他方言返回 None 走精确计数
+    if db.get_bind().dialect.name != "mysql":
+        return None
+    rows = db.execute(_MYSQL_ESTIMATE_SQL, {"table": table}).scalar()
+    return int(rows) if rows is not None else None
+
+
+def _cache_key(model, filters: Dict[str, object]):
+    return model.__tablename__, tuple(sorted(filters.items()))
+
+
+def count(db: Session, model, filters: Optional[Dict[str, object]] = None) -> Tuple[int, bool]:
+    """
+    带 TTL 缓存的行数统计，返回 (总数, 是否为估算值)。
+    无过滤条件且开启 COUNT_ESTIMATE_ENABLED 时，大表使用表统计信息估算。
+    """
+    filters = {k: v for k, v in (filters or {}).items() if v is not None}
+    key = _cache_key(model, filters)
+    cached = _count_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = None
+    if not filters and settings.COUNT_ESTIMATE_ENABLED:
+        estimated = _estimate(db, model.__tablename__)
+        if estimated is not None and estimated >= settings.COUNT_ESTIMATE_MIN_ROWS:
+            result = (estimated, True)
+    if result is None:
+        stmt = select(func.count()).select_from(model).filter_by(**filters)
+        result = (db.execute(stmt).scalar_one(), False)
+
+    _count_cache.set(key, result)
+    return result
+
+
+async def count_async(db: AsyncSession, model, filters: Optional[Dict[str, object]] = None) -> Tuple[int, bool]:
+    # 命中缓存时不必进入 run_sync
+    cached = _count_cache.get(_cache_key(model, {k: v for k, v in (filters or {}).items() if v is not None}))
+    if cached is not None:
+        return cached
+    return await db.run_sync(count, model, filters)
+
+
+def invalidate(model=None):
+    """写入后调用：丢弃该表（不传则全部）已缓存的总数，管理端列表立即看到新增/删除/状态变化。"""
+    if model is None:
+        _count_cache.clear()
+    else:
+        _count_cache.pop_matching(lambda key: key[0] == model.__tablename__)
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Set
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# 事件为 {"id": "<毫秒时间戳>-<序号>", "type": ..., "data": {...}}，id 格式与 Redis Stream 一致
+Event = dict
+Listener = Callable[[int, Event], None]
+
+_listeners: List[Listener] = []
+
+
+def add_listener(listener: Listener):
+    """每个 worker 收到任意用户的事件时都会同步调用（如失效本进程缓存），需保证足够轻量。"""
+    _listeners.append(listener)
+
+
+def event_key(event_id: str):
+    """把事件 id 转为可比较的元组；格式不对时抛 ValueError。"""
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class Subscription:
+    """
+    单个连接的事件队列。消费跟不上导致队列写满时不再阻塞发布方，
+    而是关闭该订阅（get 返回 None），客户端带上最后的事件 id 重连后从历史中补齐。
+    """
+
+    def __init__(self, uid: int, maxsize: int):
+        self.uid = uid
+        self.closed = False
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def put(self, event: Event):
+        if self.closed:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.close()
+
+    def close(self):
+        self.closed = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """超时抛出 TimeoutError；订阅被关闭时返回 None。"""
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+
+class EventBroker:
+    """
+    进程内发布/订阅：事件按用户投递给本进程的订阅者，并为每个用户保留最近的若干条用于断线续传。
+    仅适用于单 worker；多 worker 部署使用 RedisEventBroker。
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._history = TTLCache(maxsize=10_000, ttl=settings.EVENTS_HISTORY_TTL_SECONDS)
+        self._seq = 0
+        self._boot_ms = int(time.time() * 1000)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        for subs in list(self._subscribers.values()):
+            for sub in list(subs):
+                sub.close()
+        self._loop = None
+
+    # --- 发布 ---
+
+    async def publish(self, uid: int, event_type: str, data: dict) -> str:
+        with self._lock:
+            self._seq += 1
+            event = {"id": f"{self._boot_ms}-{self._seq}", "type": event_type, "data": data}
+            history = self._history.get(uid)
+            if history is None:
+                history = deque(maxlen=settings.EVENTS_HISTORY_SIZE)
+            history.append(event)
+            self._history.set(uid, history)
+        self._deliver(uid, event)
+        return event["id"]
+
+    def publish_threadsafe(self, uid: int, event_type: str, data: dict):
+        """供同步代码（线程池中的 Service）调用，不等待发布完成；broker 未启动时忽略。"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        future = asyncio.run_coroutine_threadsafe(self.publish(uid, event_type, data), loop)
+        future.add_done_callback(_log_failure)
+
+    # --- 订阅 ---
+
+    def subscribe(self, uid: int) -> Subscription:
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        sub = Subscription(uid, settings.EVENTS_QUEUE_SIZE)
+        self._subscribers.setdefault(uid, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        subs = self._subscribers.get(sub.uid)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[sub.uid]
+
+    async def history(self, uid: int, after: str) -> List[Event]:
+        after_key = event_key(after)
+        with self._lock:
+            events = list(self._history.get(uid) or ())
+        return [e for e in events if event_key(e["id"]) > after_key]
+
+    def _deliver(self, uid: int, event: Event):
+        for listener in _listeners:
+            try:
+                listener(uid, event)
+            except Exception:
+                logger.exception("event listener failed")
+        for sub in list(self._subscribers.get(uid, ())):
+            sub.put(event)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._subscribers),
+            "connections": sum(len(s) for s in self._subscribers.values()),
+        }
+
+
+class RedisEventBroker(EventBroker):
+    """
+    多 worker 共享：事件写入每个用户的 Redis Stream（保留最近 EVENTS_HISTORY_SIZE 条用于续传），
+    再经一个 Pub/Sub 频道广播；每个 worker 只维持一条订阅连接，在本地分发给各自的订阅者。
+    """
+
+    def __init__(self, client, prefix: str = "events:"):
+        super().__init__()
+        self._client = client
+        self._prefix = prefix
+        self._channel = prefix + "bus"
+        self._task: Optional[asyncio.Task] = None
+
+    def _stream(self, uid: int) -> str:
+        return f"{self._prefix}user:{uid}"
+
+    async def start(self):
+        await super().start()
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await super().stop()
+
+    async def publish(self, uid: int, event_type: str, data: dict) -> str:
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        stream = self._stream(uid)
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.xadd(stream, {"type": event_type, "data": payload},
+                      maxlen=settings.EVENTS_HISTORY_SIZE, approximate=True)
+            pipe.expire(stream, settings.EVENTS_HISTORY_TTL_SECONDS)
+            event_id = (await pipe.execute())[0]
+        event_id = event_id.decode() if isinstance(event_id, bytes) else event_id
+        message = json.dumps({"uid": uid, "id": event_id, "type": event_type, "data": data},
+                             ensure_ascii=False, default=str)
+        await self._client.publish(self._channel, message)
+        return event_id
+
+    async def history(self, uid: int, after: str) -> List[Event]:
+        event_key(after)  # 校验格式
+        entries = await self._client.xrange(self._stream(uid), min=f"({after}", max="+")
+        events = []
+        for event_id, fields in entries:
+            fields = {k.decode(): v.decode() for k, v in fields.items()}
+            events.append({
+                "id": event_id.decode() if isinstance(event_id, bytes) else event_id,
+                "type": fields["type"],
+                "data": json.loads(fields["data"]),
+            })
+        return events
+
+    async def _listen(self):
+        while True:
+            pubsub = self._client.pubsub()
+            try:
+                await pubsub.subscribe(self._channel)
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    body = json.loads(message["data"])
+                    uid = int(body.pop("uid"))
+                    self._deliver(uid, body)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("event bus subscription lost: %s", e)
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("event publish failed: %s", future.exception())
+
+
+_broker: Optional[EventBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> EventBroker:
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                if settings.EVENTS_BACKEND == "redis":
+                    client = get_redis()
+                    if client is None:
+                        raise RuntimeError("EVENTS_BACKEND=redis 需要配置 REDIS_URL")
+                    _broker = RedisEventBroker(client)
+                else:
+                    _broker = EventBroker()
+    return _broker
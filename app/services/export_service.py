@@ -0,0 +1,117 @@
+import csv
+import io
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+from pydantic_core import to_json
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.repository import project_repo, registration_repo, user_repo
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+Column = Tuple[str, Callable[[object], object]]
+
+
+def _attachment_urls(obj) -> List[str]:
+    return [a.url for a in obj.attachments]
+
+
+REGISTRATION_COLUMNS: List[Column] = [
+    ("registrationId", lambda r: r.registrationId),
+    ("uid", lambda r: r.uid),
+    ("username", lambda r: r.user.username if r.user else None),
+    ("email", lambda r: r.user.email if r.user else None),
+    ("status", lambda r: r.status),
+    ("note", lambda r: r.note),
+    ("createdAt", lambda r: r.createdAt),
+    ("attachments", _attachment_urls),
+]
+
+USER_COLUMNS: List[Column] = [
+    ("uid", lambda u: u.uid),
+    ("username", lambda u: u.username),
+    ("email", lambda u: u.email),
+    ("phone", lambda u: u.phone),
+    ("isAdmin", lambda u: u.isAdmin),
+    ("createdAt", lambda u: u.createdAt),
+    ("updatedAt", lambda u: u.updatedAt),
+]
+
+PROJECT_COLUMNS: List[Column] = [
+    ("projectId", lambda p: p.projectId),
+    ("uid", lambda p: p.uid),
+    ("title", lambda p: p.title),
+    ("description", lambda p: p.description),
+    ("repoUrl", lambda p: p.repoUrl),
+    ("demoUrl", lambda p: p.demoUrl),
+    ("createdAt", lambda p: p.createdAt),
+    ("updatedAt", lambda p: p.updatedAt),
+    ("attachments", _attachment_urls),
+]
+
+
+def _csv_cell(value) -> object:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        # 附件 URL 拍平到同一单元格
+        return " ".join(value)
+    return value
+
+
+def _encode(rows: Iterable, columns: List[Column], fmt: str) -> Iterator[bytes]:
+    """按 EXPORT_BATCH_SIZE 行攒一块再输出，内存只与单块大小有关。"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if fmt == "csv":
+        # 带 BOM，Excel 打开中文不乱码
+        buf.write("\ufeff")
+        writer.writerow([name for name, _ in columns])
+
+    pending = 0
+    for obj in rows:
+        if fmt == "csv":
+            writer.writerow([_csv_cell(get(obj)) for _, get in columns])
+        else:
+            buf.write(to_json({name: get(obj) for name, get in columns}).decode())
+            buf.write("\n")
+        pending += 1
+        if pending >= settings.EXPORT_BATCH_SIZE:
+            yield buf.getvalue().encode()
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+def _stream(load: Callable, columns: List[Column], fmt: str) -> Iterator[bytes]:
+    # StreamingResponse 在请求依赖（get_db）关闭之后才开始迭代，这里自行持有会话直到导出结束
+    db = SessionLocal()
+    try:
+        yield from _encode(load(db, settings.EXPORT_BATCH_SIZE), columns, fmt)
+    finally:
+        db.close()
+
+
+def export_registrations(fmt: str, status: str | None = None) -> Iterator[bytes]:
+    return _stream(lambda db, n: registration_repo.iter_registrations(db, status, n), REGISTRATION_COLUMNS, fmt)
+
+
+def export_users(fmt: str) -> Iterator[bytes]:
+    return _stream(user_repo.iter_users, USER_COLUMNS, fmt)
+
+
+def export_projects(fmt: str, user_id: int | None = None) -> Iterator[bytes]:
+    return _stream(lambda db, n: project_repo.iter_projects(db, user_id, n), PROJECT_COLUMNS, fmt)
+
+
+def filename(kind: str, fmt: str) -> str:
+    return f"{kind}-{datetime.utcnow():%Y%m%d%H%M%S}.{fmt}"
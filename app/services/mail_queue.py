@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.mail import SmtpConnection, build_message, is_connection_error, is_permanent_error
+from app.db.session import SessionLocal
+from app.repository import mail_repo
+
+logger = logging.getLogger(__name__)
+
+
+class MailMetrics:
+    """本 worker 的发信指标；队列深度在读取时从 mail_queue 实时统计。"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.batches = 0
+
+    def observe(self, sent: int, retried: int, failed: int, latencies):
+        with self._lock:
+            self.sent += sent
+            self.retried += retried
+            self.failed += failed
+            self.batches += 1
+            self._latencies.extend(latencies)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._latencies)
+            data = {"sent": self.sent, "retried": self.retried, "failed": self.failed, "batches": self.batches}
+        if samples:
+            data["send_latency_ms"] = {
+                "p50": round(samples[len(samples) // 2] * 1000, 2),
+                "p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+                "max": round(samples[-1] * 1000, 2),
+            }
+        return data
+
+
+metrics = MailMetrics()
+
+_task: asyncio.Task | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+_wakeup: asyncio.Event | None = None
+_connection: SmtpConnection | None = None
+
+
+def _backoff(attempts: int) -> timedelta:
+    delay = settings.MAIL_RETRY_BASE_SECONDS * (2 ** attempts) * random.uniform(0.5, 1.5)
+    return timedelta(seconds=min(delay, settings.MAIL_RETRY_MAX_SECONDS))
+
+
+def _claim(token: str) -> list[dict]:
+    db = SessionLocal()
+    try:
+        mails = mail_repo.claim_batch(db, token, settings.MAIL_BATCH_SIZE, datetime.utcnow(), settings.MAIL_CLAIM_LEASE_SECONDS)
+        # 提交后实例会过期，先取出需要的字段
+        claimed = [
+            {"id": m.id, "recipient": m.recipient, "subject": m.subject, "body": m.body,
+             "subtype": m.subtype, "attempts": m.attempts}
+            for m in mails
+        ]
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+def _record(sent: list[int], retries: list[tuple], failures: list[tuple]):
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        mail_repo.mark_sent(db, sent, now)
+        for mail_id, error, attempts in retries:
+            mail_repo.mark_retry(db, mail_id, error, now + _backoff(attempts))
+        for mail_id, error in failures:
+            mail_repo.mark_failed(db, mail_id, error)
+        db.commit()
+    finally:
+        db.close()
+
+
+def purge_finished(batch: int = 1000) -> int:
+    """按保留期分批删除已发送 / 最终失败的邮件，每批单独提交，避免长时间持锁。"""
+    before = datetime.utcnow() - timedelta(days=settings.MAIL_RETENTION_DAYS)
+    total = 0
+    while True:
+        db = SessionLocal()
+        try:
+            purged = mail_repo.purge_finished(db, before, batch)
+            db.commit()
+        finally:
+            db.close()
+        total += purged
+        if purged < batch:
+            return total
+
+
+async def process_batch() -> int:
+    """认领一批到期邮件并通过同一条 SMTP 连接依次发送，返回认领的数量。"""
+    global _connection
+    if _connection is None:
+        _connection = SmtpConnection()
+    mails = await run_in_threadpool(_claim, uuid.uuid4().hex)
+    if not mails:
+        return 0
+
+    sent, retries, failures, latencies = [], [], [], []
+    for index, m in enumerate(mails):
+        started = time.perf_counter()
+        try:
+            await _connection.send(build_message(m["recipient"], m["subject"], m["body"], m["subtype"]))
+            sent.append(m["id"])
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if is_permanent_error(e) or m["attempts"] + 1 >= settings.MAIL_MAX_ATTEMPTS:
+                logger.error("mail %s to %s failed permanently: %s", m["id"], m["recipient"], error)
+                failures.append((m["id"], error))
+            else:
+                logger.warning("mail %s to %s failed, will retry: %s", m["id"], m["recipient"], error)
+                retries.append((m["id"], error, m["attempts"]))
+            if is_connection_error(e):
+                # 服务器不可达：本批剩余邮件不再逐封等待超时，直接安排重试
+                retries.extend((r["id"], error, r["attempts"]) for r in mails[index + 1:])
+                break
+
+    await run_in_threadpool(_record, sent, retries, failures)
+    metrics.observe(len(sent), len(retries), len(failures), latencies)
+    return len(mails)
+
+
+async def _purge_if_due(last: float) -> float:
+    now = time.monotonic()
+    if now - last < settings.MAIL_PURGE_INTERVAL_SECONDS:
+        return last
+    try:
+        purged = await run_in_threadpool(purge_finished)
+        if purged:
+            logger.info("purged %d finished mails", purged)
+    except Exception as e:
+        logger.warning("mail queue purge failed: %s", e)
+    return now
+
+
+async def _run():
+    last_purge = float("-inf")
+    while True:
+        last_purge = await _purge_if_due(last_purge)
+        _wakeup.clear()
+        try:
+            claimed = await process_batch()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("mail queue batch failed: %s", e)
+            claimed = 0
+        if claimed >= settings.MAIL_BATCH_SIZE:
+            continue  # 可能还有积压，立即处理下一批
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.MAIL_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start():
+    global _task, _loop, _wakeup
+    if not settings.MAIL_QUEUE_ENABLED or not settings.MAIL_SERVER:
+        logger.info("mail queue worker disabled; mails stay in mail_queue")
+        return
+    if _task is not None:
+        return
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    _task = asyncio.create_task(_run())
+
+
+async def stop():
+    global _task, _connection
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    if _connection is not None:
+        await _connection.close()
+        _connection = None
+
+
+def notify():
+    """有新邮件入队后唤醒发信循环；可在线程池中调用。"""
+    if _loop is not None and _wakeup is not None:
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+def get_metrics(db: Session) -> dict:
+    return {"queue_depth": mail_repo.queue_depth(db), **metrics.snapshot()}
@@ -0,0 +1,43 @@
+from typing import Awaitable, Callable, Optional, Tuple
+
+from app.core.cache import ReadThroughCache
+from app.core.config import settings
+from app.core.response import ok
+from app.schemas import ProjectOut
+from app.utils.http import body_etag
+
+# 缓存已序列化的响应体及其 ETag：(body, etag)
+CachedBody = Tuple[bytes, str]
+
+_details = ReadThroughCache(settings.PROJECT_CACHE_SIZE, settings.PROJECT_CACHE_TTL_SECONDS)
+_mine = ReadThroughCache(settings.PROJECT_CACHE_SIZE, settings.PROJECT_CACHE_TTL_SECONDS)
+
+
+def render(data) -> CachedBody:
+    # ETag 取自序列化结果（其中包含 updatedAt），附件/缩略图变化但 updatedAt 不变时也能正确失效
+    body = ok(data).body
+    return body, body_etag(body)
+
+
+async def get_detail(project_id: int, load: Callable[[], Awaitable]) -> Optional[CachedBody]:
+    async def loader():
+        project = await load()
+        return render(ProjectOut.model_validate(project)) if project else None
+    return await _details.get(project_id, loader)
+
+
+async def get_mine(uid: int, load: Callable[[], Awaitable]) -> CachedBody:
+    async def loader():
+        return render([ProjectOut.model_validate(p) for p in await load()])
+    return await _mine.get(uid, loader)
+
+
+def invalidate(project_id: int | None = None, uid: int | None = None):
+    if project_id is not None:
+        _details.invalidate(project_id)
+    if uid is not None:
+        _mine.invalidate(uid)
+
+
+def stats() -> dict:
+    return {"details": _details.stats(), "mine": _mine.stats()}
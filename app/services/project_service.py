@@ -1,9 +1,9 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from app.models import User, Project, Attachment
+from app.models import User, Project
 from app.schemas import ProjectIn
-from app.repository import project_repo, attachment_repo
-from typing import List
+from app.repository import project_repo
+from app.services import count_service, project_cache
 
 from app.services.attachment_service import AttachmentService, NotFoundError, ForbiddenError, ConflictError
 
@@ -19,15 +19,13 @@ class ProjectService:
             self.db.flush()
 
             if data.attachment_ids:
-                for att_id in data.attachment_ids:
-                    attachment = self.attachment_service.validate_and_get_attachment(
-                        att_id=att_id,
-                        user_id=user.uid
-                    )
-
-                    attachment_repo.link_attachment_to_project(self.db, attachment, new_project.projectId)
+                self.attachment_service.validate_and_claim_many(
+                    data.attachment_ids, user.uid, project_id=new_project.projectId
+                )
 
             self.db.commit()
+            project_cache.invalidate(uid=user.uid)
+            count_service.invalidate(Project)
             self.db.refresh(new_project)
             return new_project
 
@@ -37,12 +35,3 @@ class ProjectService:
         except Exception as e:
             self.db.rollback()
             raise HTTPException(status_code=500, detail=f"创建项目失败: {str(e)}")
-
-    def get_my_projects(self, user: User) -> List[Project]:
-        return project_repo.get_projects_by_uid(self.db, user.uid)
-
-    def get_project_details(self, project_id: int) -> Project:
-        project = project_repo.get_project_by_id(self.db, project_id)
-        if not project:
-            raise NotFoundError("项目不存在")  # 使用集中的异常
-        return project
\ No newline at end of file
@@ -0,0 +1,64 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from app.core.cache import ReadThroughCache
+from app.core.config import settings
+from app.schemas import RegistrationOut
+from app.services import event_broker
+from app.services.project_cache import CachedBody, render
+
+EVENT_TYPE = "registration"
+
+_status = ReadThroughCache(settings.REGISTRATION_STATUS_CACHE_SIZE, settings.REGISTRATION_STATUS_CACHE_TTL_SECONDS)
+
+
+async def get_status(uid: int, load: Callable[[], Awaitable]) -> Optional[CachedBody]:
+    async def loader():
+        reg = await load()
+        return render(RegistrationOut.model_validate(reg)) if reg else None
+    return await _status.get(uid, loader)
+
+
+async def wait_for_change(uid: int, etag: str, timeout: float, load: Callable[[], Awaitable]) -> Optional[CachedBody]:
+    """
+    等到该用户报名的 ETag 不再是 etag（或超时）后返回最新快照。
+    先订阅再读取快照，读取期间发生的变更也不会被漏掉。
+    """
+    broker = event_broker.get_broker()
+    sub = broker.subscribe(uid)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while True:
+            cached = await get_status(uid, load)
+            remaining = deadline - loop.time()
+            if cached is None or cached[1] != etag or remaining <= 0 or sub.closed:
+                return cached
+            try:
+                await sub.get(timeout=remaining)
+            except TimeoutError:
+                pass
+    finally:
+        broker.unsubscribe(sub)
+
+
+def changed(uid: int, **data):
+    """
+    报名变更提交后调用（可能运行在线程池中）：立即失效本进程的快照，
+    并经 broker 通知 SSE 连接、长轮询以及其它 worker。
+    """
+    _status.invalidate(uid)
+    event_broker.get_broker().publish_threadsafe(uid, EVENT_TYPE, data)
+
+
+def _on_event(uid: int, event: event_broker.Event):
+    # 其它 worker 发布的变更同样需要失效本进程的快照
+    if event["type"] == EVENT_TYPE:
+        _status.invalidate(uid)
+
+
+event_broker.add_listener(_on_event)
+
+
+def stats() -> dict:
+    return {"status": _status.stats(), "subscribers": event_broker.get_broker().stats()}
@@ -1,12 +1,17 @@
+from typing import Iterator
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from app.models import User, Registration
-from app.schemas import RegistrationIn, AdminRegistrationCreate
-from app.repository import registration_repo, attachment_repo
+from app.schemas import RegistrationIn, AdminRegistrationCreate, RegistrationBulkAudit
+from app.repository import registration_repo
+from app.services import count_service, registration_cache
 
 from app.services.attachment_service import AttachmentService, NotFoundError, ForbiddenError, ConflictError
 
 
+AUDIT_STATUSES = {"approved", "rejected", "pending"}
+
+
 class RegistrationService:
     def __init__(self, db: Session):
         self.db = db
@@ -21,16 +26,14 @@ class RegistrationService:
             self.db.flush()
 
             if data.attachment_ids:
-                for att_id in data.attachment_ids:
-                    attachment = self.attachment_service.validate_and_get_attachment(
-                        att_id=att_id,
-                        user_id=user.uid
-                    )
-
-                    attachment_repo.link_attachment_to_registration(self.db, attachment, new_reg.registrationId)
+                self.attachment_service.validate_and_claim_many(
+                    data.attachment_ids, user.uid, registration_id=new_reg.registrationId
+                )
 
             self.db.commit()
             self.db.refresh(new_reg)
+            count_service.invalidate(Registration)
+            registration_cache.changed(user.uid, registrationId=new_reg.registrationId, status=new_reg.status)
             return new_reg
         except (NotFoundError, ForbiddenError, ConflictError) as e:
             self.db.rollback()
@@ -39,38 +42,84 @@ class RegistrationService:
             self.db.rollback()
             raise HTTPException(status_code=500, detail=f"报名失败: {str(e)}")
 
-    def get_status(self, user: User) -> Registration:
-        reg = registration_repo.get_registration_by_uid(self.db, user.uid, eager_load=True)
-        if not reg:
-            raise NotFoundError("尚未提交报名")
-        return reg
-
-    def get_all_registrations(self, status: str | None, page: int, page_size: int = 20):
-        items, total = registration_repo.list_registrations(self.db, status, page, page_size)
-        return {"items": items, "total": total, "page": page, "page_size": page_size}
-
     def audit_registration(self, registration_id: int, status: str) -> Registration:
-        if status not in {"approved", "rejected", "pending"}:
+        if status not in AUDIT_STATUSES:
             raise ValueError("非法审核状态")
         reg = registration_repo.get_registration_by_id(self.db, registration_id, eager_load=True)
         if not reg:
             raise NotFoundError("报名不存在")
         try:
+            previous = reg.status
             registration_repo.update_registration_status(self.db, reg, status)
             self.db.commit()
             self.db.refresh(reg)
+            count_service.invalidate(Registration)
+            registration_cache.changed(reg.uid, registrationId=reg.registrationId, status=status, previous=previous)
             return reg
         except Exception as e:
             self.db.rollback()
             raise HTTPException(status_code=500, detail=f"审核失败: {str(e)}")
 
+    @staticmethod
+    def validate_bulk_audit(data: RegistrationBulkAudit):
+        if data.status not in AUDIT_STATUSES:
+            raise ValueError("非法审核状态")
+        if (data.ids is None) == (data.filter_status is None):
+            raise ValueError("ids 与 filter_status 必须且只能指定一个")
+        if data.filter_status is not None and data.filter_status not in AUDIT_STATUSES:
+            raise ValueError("非法筛选状态")
+
+    def bulk_audit_steps(self, data: RegistrationBulkAudit, chunk_size: int | None = None) -> Iterator[dict]:
+        """
+        批量审核：先锁定目标行，再用集合 UPDATE 修改状态，整个过程在一个事务内。
+        指定 chunk_size 时按块执行并在每块后产出进度；最后产出 {"type": "result", ...}。
+        """
+        self.validate_bulk_audit(data)
+        ids = list(dict.fromkeys(data.ids)) if data.ids is not None else None
+        try:
+            rows = registration_repo.lock_statuses(self.db, ids=ids, status=data.filter_status)
+            pending = [row for row in rows if row[1] != data.status]
+            step = chunk_size or max(len(pending), 1)
+            updated = 0
+            for start in range(0, len(pending), step):
+                updated += registration_repo.bulk_update_status(self.db, pending[start:start + step], data.status)
+                if chunk_size:
+                    yield {"type": "progress", "processed": min(start + step, len(pending)), "total": len(pending), "updated": updated}
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise HTTPException(status_code=500, detail=f"批量审核失败: {str(e)}")
+        if pending:
+            count_service.invalidate(Registration)
+        for rid, old, uid in pending:
+            registration_cache.changed(uid, registrationId=rid, status=data.status, previous=old)
+
+        previous = {rid: old for rid, old, _ in rows}
+        results = [
+            {"registrationId": rid, "previous": previous[rid],
+             "result": "unchanged" if previous[rid] == data.status else "updated"}
+            for rid in (ids if ids is not None else previous)
+            if rid in previous
+        ]
+        if ids is not None:
+            results += [{"registrationId": rid, "previous": None, "result": "not_found"} for rid in ids if rid not in previous]
+        yield {"type": "result", "status": data.status, "matched": len(rows), "updated": updated, "results": results}
+
+    def bulk_audit(self, data: RegistrationBulkAudit) -> dict:
+        *_, result = self.bulk_audit_steps(data)
+        result.pop("type")
+        return result
+
     def delete_registration(self, registration_id: int):
         reg = registration_repo.get_registration_by_id(self.db, registration_id, eager_load=False)
         if not reg:
             raise NotFoundError("报名不存在")
         try:
+            uid, previous = reg.uid, reg.status
             registration_repo.delete_registration(self.db, reg)
             self.db.commit()
+            count_service.invalidate(Registration)
+            registration_cache.changed(uid, registrationId=registration_id, status=None, previous=previous)
         except Exception as e:
             self.db.rollback()
             raise HTTPException(status_code=500, detail=f"删除失败: {str(e)}")
@@ -84,6 +133,7 @@ class RegistrationService:
             self.db.add(reg)
             self.db.commit()
             self.db.refresh(reg)
+            registration_cache.changed(reg.uid, registrationId=reg.registrationId, status=reg.status)
             return reg
         except Exception as e:
             self.db.rollback()
@@ -95,11 +145,13 @@ class RegistrationService:
             new_reg = registration_repo.create_registration(self.db, RegistrationIn(note=data.note, attachment_ids=data.attachment_ids or []), data.uid)
             self.db.flush()
             if data.attachment_ids:
-                for att_id in data.attachment_ids:
-                    attachment = self.attachment_service.validate_and_get_attachment(att_id=att_id, user_id=data.uid)
-                    attachment_repo.link_attachment_to_registration(self.db, attachment, new_reg.registrationId)
+                self.attachment_service.validate_and_claim_many(
+                    data.attachment_ids, data.uid, registration_id=new_reg.registrationId
+                )
             self.db.commit()
             self.db.refresh(new_reg)
+            count_service.invalidate(Registration)
+            registration_cache.changed(data.uid, registrationId=new_reg.registrationId, status=new_reg.status)
             return new_reg
         except (NotFoundError, ForbiddenError, ConflictError) as e:
             self.db.rollback()
@@ -1,20 +1,120 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
+from app.core.redis import get_redis
+from app.db.session import SessionLocal
 from app.models import User, Registration, Project, Attachment
+from app.repository import stats_repo
+
+logger = logging.getLogger(__name__)
+
+REGISTRATION_STATUSES = ("pending", "approved", "rejected")
 
 
 class StatsService:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_counts(self) -> dict:
-        users = self.db.query(func.count(User.uid)).scalar() or 0
-        registrations = self.db.query(func.count(Registration.registrationId)).scalar() or 0
-        projects = self.db.query(func.count(Project.projectId)).scalar() or 0
-        attachments = self.db.query(func.count(Attachment.id)).scalar() or 0
+    def get_counts(self, days: int = 30) -> dict:
+        """只读取 stats_counters，不扫描业务表。"""
+        today = datetime.utcnow().date()
+        since = today - timedelta(days=days - 1)
+        values = {
+            (c.name, c.bucket): c.value
+            for c in stats_repo.list_counters(self.db, stats_repo.day_bucket(since))
+        }
+
+        def total(name: str) -> int:
+            return values.get((name, stats_repo.TOTAL), 0)
+
+        def series(name: str) -> list:
+            return [
+                {"date": bucket, "count": values.get((name, bucket), 0)}
+                for bucket in (stats_repo.day_bucket(since + timedelta(days=i)) for i in range(days))
+            ]
+
         return {
-            "users": users,
-            "registrations": registrations,
-            "projects": projects,
-            "attachments": attachments,
+            "users": total(stats_repo.USERS),
+            "registrations": total(stats_repo.REGISTRATIONS),
+            "projects": total(stats_repo.PROJECTS),
+            "attachments": total(stats_repo.ATTACHMENTS),
+            "registrations_by_status": {
+                s: total(stats_repo.registration_status_counter(s)) for s in REGISTRATION_STATUSES
+            },
+            "daily": {
+                "signups": series(stats_repo.DAILY_SIGNUPS),
+                "registrations": series(stats_repo.DAILY_REGISTRATIONS),
+            },
         }
+
+    def _actual_counts(self) -> dict:
+        actual = {}
+        for name, model in (
+            (stats_repo.USERS, User),
+            (stats_repo.REGISTRATIONS, Registration),
+            (stats_repo.PROJECTS, Project),
+            (stats_repo.ATTACHMENTS, Attachment),
+        ):
+            actual[(name, stats_repo.TOTAL)] = self.db.execute(select(func.count()).select_from(model)).scalar_one()
+
+        rows = self.db.execute(select(Registration.status, func.count()).group_by(Registration.status))
+        for status, n in rows:
+            actual[(stats_repo.registration_status_counter(status), stats_repo.TOTAL)] = n
+
+        for name, col in (
+            (stats_repo.DAILY_SIGNUPS, User.createdAt),
+            (stats_repo.DAILY_REGISTRATIONS, Registration.createdAt),
+        ):
+            day = func.date(col)
+            for d, n in self.db.execute(select(day, func.count()).group_by(day)):
+                actual[(name, stats_repo.day_bucket(d))] = n
+        return actual
+
+    def reconcile(self) -> dict:
+        """
+        用真实计数校正计数器，返回有偏差的项 {"name[@bucket]": {"counter": x, "actual": y}}。
+        """
+        try:
+            current = stats_repo.lock_counters(self.db)
+            actual = self._actual_counts()
+            drift = {}
+            for key in current.keys() | actual.keys():
+                expected = actual.get(key, 0)
+                if current.get(key, 0) != expected:
+                    name, bucket = key
+                    drift[f"{name}@{bucket}" if bucket else name] = {"counter": current.get(key), "actual": expected}
+                    stats_repo.set_counter(self.db, name, bucket, expected)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        if drift:
+            logger.warning("stats counters drifted, reconciled: %s", drift)
+        return drift
+
+
+def _acquire_lease_sql(seconds: int) -> bool:
+    db = SessionLocal()
+    try:
+        acquired = stats_repo.acquire_reconcile_lease(db, int(time.time()), seconds)
+        db.commit()
+        return acquired
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def acquire_reconcile_lease(seconds: int) -> bool:
+    """
+    定期对账的跨进程租约：每 seconds 秒内只有一个 worker 能拿到。
+    配置了 REDIS_URL 时用 SET NX EX，否则用 stats_counters 中的租约行。
+    """
+    client = get_redis()
+    if client is not None:
+        return bool(await client.set("stats:reconcile_lease", 1, nx=True, ex=seconds))
+    return await run_in_threadpool(_acquire_lease_sql, seconds)
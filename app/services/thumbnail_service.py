@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.repository import attachment_repo
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 未安装时不生成缩略图
+    Image = None
+
+try:
+    import pymupdf
+except ImportError:  # PyMuPDF 未安装时跳过 PDF 预览
+    pymupdf = None
+
+logger = logging.getLogger(__name__)
+
+THUMB_DIR = "thumbs"
+IMAGE_MIMES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=max(1, settings.THUMBNAIL_WORKERS))
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def thumbnail_location(sha256: str) -> tuple[str, str]:
+    """缩略图同样按内容哈希存放：(相对 UPLOAD_DIR 的子目录, 文件名)。"""
+    return f"{THUMB_DIR}/{sha256[:2]}/{sha256[2:4]}", sha256 + ".webp"
+
+
+def can_render(mime: str) -> bool:
+    if Image is None or not settings.THUMBNAIL_ENABLED:
+        return False
+    if mime == "application/pdf":
+        return pymupdf is not None
+    return mime in IMAGE_MIMES
+
+
+def _open_source(src_path: str, mime: str):
+    if mime == "application/pdf":
+        with pymupdf.open(src_path) as doc:
+            pix = doc[0].get_pixmap()
+            return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    img = Image.open(src_path)
+    img.seek(0)  # GIF 只取第一帧
+    return img
+
+
+def render_thumbnail(src_path: str, mime: str, dest_path: str, max_size: int) -> tuple[int, int]:
+    """
+    在工作进程中执行：生成 WebP 缩略图（已存在则跳过），返回原图（PDF 为首页）的宽高。
+    """
+    img = _open_source(src_path, mime)
+    size = img.size
+    if not os.path.exists(dest_path):
+        img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+        img.thumbnail((max_size, max_size))
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        tmp_path = f"{dest_path}.{os.getpid()}.part"
+        img.save(tmp_path, "WEBP", quality=80)
+        os.replace(tmp_path, dest_path)
+    return size
+
+
+def _save_thumbnail(attachment_id: int, url: str, width: int, height: int):
+    db = SessionLocal()
+    try:
+        attachment_repo.set_thumbnail(db, attachment_id, url, width, height)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def generate_thumbnail(attachment_id: int, src_path: str, mime: str, sha256: str):
+    """上传完成后的后台任务：在进程池中生成缩略图并回写到附件记录。"""
+    # 避免与 upload_service 循环导入
+    from app.services.upload_service import build_public_url
+
+    sub_folder, filename = thumbnail_location(sha256)
+    dest_path = os.path.join(settings.UPLOAD_DIR, sub_folder, filename)
+    try:
+        loop = asyncio.get_running_loop()
+        width, height = await loop.run_in_executor(
+            _get_executor(), render_thumbnail, src_path, mime, dest_path, settings.THUMBNAIL_MAX_SIZE
+        )
+        await run_in_threadpool(_save_thumbnail, attachment_id, build_public_url(sub_folder, filename), width, height)
+    except Exception as e:
+        logger.exception("generate_thumbnail failed for attachment %s: %s", attachment_id, e)
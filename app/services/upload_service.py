@@ -1,13 +1,17 @@
-from fastapi import UploadFile, HTTPException, status
+from fastapi import BackgroundTasks, UploadFile, HTTPException, status
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.models import User
-from app.repository import attachment_repo
+from app.repository import attachment_repo, blob_repo
 from app.core.config import settings
-import os, uuid, mimetypes
+import os, mimetypes, tempfile, hashlib, time
+from datetime import datetime, timedelta
 import magic
 from app.models.attachment_model import Attachment
+from app.services import thumbnail_service
 
 SAFE_MIMES = {"image/jpeg", "image/png", "image/gif", "image/webp", "application/pdf"}
+UPLOAD_CHUNK_SIZE = 64 * 1024
 
 
 def guess_mime(filename: str, header_bytes: bytes) -> str:
@@ -26,28 +30,74 @@ def guess_mime(filename: str, header_bytes: bytes) -> str:
 
 def build_public_url(sub_folder: str, filename: str) -> str:
     base = settings.PUBLIC_BASE_URL.rstrip("/") if settings.PUBLIC_BASE_URL else ""
-    if base:
+    if base and settings.STATIC_SERVE_MODE == "external":
         return f"{base}/{sub_folder}/{filename}"
-    return f"/static/{sub_folder}/{filename}"
+    return f"{base}/static/{sub_folder}/{filename}"
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+BLOB_DIR = "blobs"
+
+
+def blob_location(sha256: str, ext: str) -> tuple[str, str]:
+    """内容寻址的存储位置：(相对 UPLOAD_DIR 的子目录, 文件名)，如 ("blobs/ab/cd", "<sha256>.pdf")。"""
+    return f"{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}", sha256 + ext
+
+
+async def _stream_to_tempfile(file: UploadFile, first_chunk: bytes, tmp_dir: str) -> tuple[str, int, str]:
+    """
+    分块写入临时文件并同时计算 sha256，超过 MAX_UPLOAD_SIZE 立即中止（413）。
+    返回 (临时文件路径, 字节数, sha256)。
+    """
+    fd, tmp_path = await run_in_threadpool(tempfile.mkstemp, dir=tmp_dir, prefix=".upload-", suffix=".part")
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            chunk = first_chunk
+            while chunk:
+                size += len(chunk)
+                if size > settings.MAX_UPLOAD_SIZE:
+                    raise HTTPException(status_code=413, detail="文件过大")
+                digest.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        await run_in_threadpool(_remove_quietly, tmp_path)
+        raise
+    return tmp_path, size, digest.hexdigest()
+
+
+def _place_blob(tmp_path: str, path: str):
+    # 相同内容的 Blob 已存在时直接丢弃临时文件，否则原子地 rename 到位
+    if os.path.exists(path):
+        _remove_quietly(tmp_path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # mkstemp 创建的文件权限为 0600，改为与普通写入一致，方便前置代理直接读取
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
 
 
 class UploadService:
     def __init__(self, db: Session):
         self.db = db
 
-    async def save_file(self, file: UploadFile, context: str, user: User) -> (Attachment, int):
-        context_map = {"registration": "报名", "project": "项目"}
-        context_zh = context_map.get(context)
-        folder_name = f"{user.uid}_{context_zh}"
-        target_dir = os.path.join(settings.UPLOAD_DIR, folder_name)
-
-        data = await file.read()
-        size = len(data)
-        if size > settings.MAX_UPLOAD_SIZE:
+    async def save_file(self, file: UploadFile, context: str, user: User,
+                        background: BackgroundTasks | None = None) -> (Attachment, int):
+        # 文件按内容哈希存放在 UPLOAD_DIR/blobs 下，context 仅用于校验入参
+        if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE:
             raise HTTPException(status_code=413, detail="文件过大")
 
         original_filename = file.filename or "upload.bin"
-        mime = guess_mime(original_filename, data[:4096])
+        first_chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        mime = guess_mime(original_filename, first_chunk[:4096])
         if mime not in SAFE_MIMES:
             raise HTTPException(status_code=400, detail="不支持的文件类型")
 
@@ -56,19 +106,102 @@ class UploadService:
             'image/webp': '.webp', 'application/pdf': '.pdf'
         }
         ext = ext_map.get(mime, "")
-        os.makedirs(target_dir, exist_ok=True)
-        key = uuid.uuid4().hex + ext
-        path = os.path.join(target_dir, key)
-        url = build_public_url(folder_name, key)
+        tmp_dir = os.path.join(settings.UPLOAD_DIR, BLOB_DIR, ".tmp")
+        await run_in_threadpool(os.makedirs, tmp_dir, exist_ok=True)
+
+        tmp_path, size, sha256 = await _stream_to_tempfile(file, first_chunk, tmp_dir)
+        sub_folder, key = blob_location(sha256, ext)
+        blob_path = os.path.join(settings.UPLOAD_DIR, sub_folder, key)
 
+        # 先提交再落盘：提交失败只需删除临时文件；落盘失败则撤销刚提交的附件与 Blob 引用
+        url = build_public_url(sub_folder, key)
         try:
-            new_attachment = attachment_repo.create_attachment(self.db, user.uid, url, key, original_filename, mime)
-            with open(path, "wb") as f:
-                f.write(data)
+            new_attachment = await run_in_threadpool(
+                self._persist, user.uid, url, key, original_filename, mime, sha256, size, f"{sub_folder}/{key}"
+            )
+        except BaseException:
+            await run_in_threadpool(_remove_quietly, tmp_path)
+            raise
+        try:
+            await run_in_threadpool(_place_blob, tmp_path, blob_path)
+        except Exception as e:
+            await run_in_threadpool(_remove_quietly, tmp_path)
+            await run_in_threadpool(self._discard, new_attachment.id, sha256)
+            raise HTTPException(status_code=500, detail=f"文件保存失败: {str(e)}")
+        if background is not None and thumbnail_service.can_render(mime):
+            background.add_task(thumbnail_service.generate_thumbnail, new_attachment.id, blob_path, mime, sha256)
+        return new_attachment, size
 
+    def _persist(self, user_id: int, url: str, key: str, filename: str, mime: str,
+                 sha256: str, size: int, blob_path: str) -> Attachment:
+        try:
+            blob_repo.acquire_blob(self.db, sha256, size, mime, blob_path)
+            new_attachment = attachment_repo.create_attachment(self.db, user_id, url, key, filename, mime, sha256)
             self.db.commit()
             self.db.refresh(new_attachment)
-            return new_attachment, size
+            return new_attachment
         except Exception as e:
             self.db.rollback()
             raise HTTPException(status_code=500, detail=f"数据库错误: {str(e)}")
+
+    def _discard(self, attachment_id: int, sha256: str):
+        try:
+            attachment_repo.delete_attachments(self.db, [(attachment_id, sha256)])
+            self.db.commit()
+        except Exception:
+            # 撤销失败时附件与 Blob 引用保留，文件缺失；开启未认领清理（UPLOAD_UNCLAIMED_TTL_HOURS）时会被回收
+            self.db.rollback()
+
+    def purge_unclaimed_attachments(self, batch: int = 500) -> int:
+        """删除上传超过 UPLOAD_UNCLAIMED_TTL_HOURS 仍未被项目/报名认领的附件，归还其 Blob 引用；未设置时不做任何事。"""
+        if settings.UPLOAD_UNCLAIMED_TTL_HOURS is None:
+            return 0
+        before = datetime.utcnow() - timedelta(hours=settings.UPLOAD_UNCLAIMED_TTL_HOURS)
+        purged = 0
+        while True:
+            try:
+                rows = attachment_repo.lock_unclaimed(self.db, before, batch)
+                purged += attachment_repo.delete_attachments(self.db, rows)
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+            if len(rows) < batch:
+                return purged
+
+    @staticmethod
+    def purge_stale_tempfiles(max_age_seconds: int = 24 * 3600) -> int:
+        """删除进程中途退出遗留在 blobs/.tmp 下的临时文件。"""
+        tmp_dir = os.path.join(settings.UPLOAD_DIR, BLOB_DIR, ".tmp")
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        try:
+            entries = list(os.scandir(tmp_dir))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def purge_unreferenced_blobs(self) -> int:
+        """删除引用计数归零的 Blob 及其文件，返回删除的数量。"""
+        purged = 0
+        for blob in blob_repo.list_unreferenced(self.db):
+            try:
+                # DELETE 持有行锁直到提交：先删文件再提交，同哈希的并发上传在 acquire_blob 处等待，
+                # 提交后重新插入 Blob 并落盘，不会指向被删掉的文件
+                if blob_repo.delete_if_unreferenced(self.db, blob.sha256):
+                    _remove_quietly(os.path.join(settings.UPLOAD_DIR, blob.path))
+                    thumb_folder, thumb_name = thumbnail_service.thumbnail_location(blob.sha256)
+                    _remove_quietly(os.path.join(settings.UPLOAD_DIR, thumb_folder, thumb_name))
+                    purged += 1
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+        return purged
@@ -0,0 +1,243 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.db.session import SessionLocal
+from app.repository import vcode_repo
+
+
+class VerificationCodeStore(ABC):
+    """
+    验证码存储。issue 在未达到最小发送间隔时返回 False；
+    check 只校验不消费，用于在耗时操作前尽早拒绝错误的验证码；
+    consume 原子地校验并删除验证码，同一验证码只能被使用一次；
+    restore 在消费后业务写入失败时放回验证码（不覆盖期间新发送的验证码，也不占用发送间隔）。
+    """
+
+    @abstractmethod
+    async def issue(self, email: str, vcode_type: str, code: str, ttl_seconds: int, min_interval: int) -> bool:
+        ...
+
+    @abstractmethod
+    async def check(self, email: str, vcode_type: str, code: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def consume(self, email: str, vcode_type: str, code: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def restore(self, email: str, vcode_type: str, code: str, ttl_seconds: int):
+        ...
+
+
+class MemoryCodeStore(VerificationCodeStore):
+    """进程内存储，仅适用于单 worker 开发环境。"""
+
+    def __init__(self, maxsize: int = 100_000):
+        self._codes = TTLCache(maxsize)
+        self._lock = threading.Lock()
+
+    async def issue(self, email, vcode_type, code, ttl_seconds, min_interval):
+        key = (vcode_type, email)
+        now = time.monotonic()
+        with self._lock:
+            current = self._codes.get(key)
+            if current is not None and now - current[1] < min_interval:
+                return False
+            self._codes.set(key, (code, now), ttl=ttl_seconds)
+        return True
+
+    async def check(self, email, vcode_type, code):
+        current = self._codes.get((vcode_type, email))
+        return current is not None and current[0] == code
+
+    async def consume(self, email, vcode_type, code):
+        key = (vcode_type, email)
+        with self._lock:
+            current = self._codes.get(key)
+            if current is None or current[0] != code:
+                return False
+            self._codes.pop(key)
+        return True
+
+    async def restore(self, email, vcode_type, code, ttl_seconds):
+        key = (vcode_type, email)
+        with self._lock:
+            if self._codes.get(key) is None:
+                self._codes.set(key, (code, float("-inf")), ttl=ttl_seconds)
+
+
+# KEYS[1]=验证码键；ARGV=验证码, 有效期(ms), 最小发送间隔(ms)
+_ISSUE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local sent = tonumber(redis.call('HGET', KEYS[1], 'sent'))
+if sent and now - sent < tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'code', ARGV[1], 'sent', now)
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+_CONSUME_LUA = """
+if redis.call('HGET', KEYS[1], 'code') == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+return 0
+"""
+
+# 不写入 sent 字段，放回的验证码不限制重新发送；ARGV=验证码, 有效期(ms)
+_RESTORE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'code', ARGV[1])
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class RedisCodeStore(VerificationCodeStore):
+    """基于 Redis 键过期的存储，多个 worker 共享。"""
+
+    def __init__(self, client, prefix: str = "vc:"):
+        self._prefix = prefix
+        self._client = client
+        self._issue = client.register_script(_ISSUE_LUA)
+        self._consume = client.register_script(_CONSUME_LUA)
+        self._restore = client.register_script(_RESTORE_LUA)
+
+    def _key(self, email: str, vcode_type: str) -> str:
+        return f"{self._prefix}{vcode_type}:{email}"
+
+    async def issue(self, email, vcode_type, code, ttl_seconds, min_interval):
+        issued = await self._issue(
+            keys=[self._key(email, vcode_type)], args=[code, ttl_seconds * 1000, min_interval * 1000]
+        )
+        return bool(int(issued))
+
+    async def check(self, email, vcode_type, code):
+        current = await self._client.hget(self._key(email, vcode_type), "code")
+        if isinstance(current, bytes):
+            current = current.decode()
+        return current == code
+
+    async def consume(self, email, vcode_type, code):
+        return bool(int(await self._consume(keys=[self._key(email, vcode_type)], args=[code])))
+
+    async def restore(self, email, vcode_type, code, ttl_seconds):
+        await self._restore(keys=[self._key(email, vcode_type)], args=[code, ttl_seconds * 1000])
+
+
+class SqlCodeStore(VerificationCodeStore):
+    """verification_codes 表；过期行由 purge_expired 定期清理。"""
+
+    @staticmethod
+    def _issue(email, vcode_type, code, ttl_seconds, min_interval) -> bool:
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            vc = vcode_repo.get_code(db, email, vcode_type)
+            if vc and (now - vc.last_send_at).total_seconds() < min_interval:
+                return False
+            vcode_repo.create_or_update_code(db, vc, email, vcode_type, code, now + timedelta(seconds=ttl_seconds), now)
+            db.commit()
+            return True
+        except IntegrityError:
+            # 并发发送撞上唯一约束：另一个请求刚刚发送过
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    @staticmethod
+    def _check(email, vcode_type, code) -> bool:
+        db = SessionLocal()
+        try:
+            vc = vcode_repo.get_code(db, email, vcode_type)
+            return vc is not None and vc.code == code and vc.expires_at >= datetime.utcnow()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _consume(email, vcode_type, code) -> bool:
+        db = SessionLocal()
+        try:
+            consumed = vcode_repo.consume_code(db, email, vcode_type, code, datetime.utcnow())
+            db.commit()
+            return consumed
+        finally:
+            db.close()
+
+    @staticmethod
+    def _restore(email, vcode_type, code, ttl_seconds):
+        db = SessionLocal()
+        try:
+            if vcode_repo.get_code(db, email, vcode_type) is not None:
+                return
+            now = datetime.utcnow()
+            # last_send_at 回拨一个发送间隔，放回的验证码不限制重新发送
+            sent = now - timedelta(seconds=settings.VERIFICATION_CODE_MIN_INTERVAL_SECONDS)
+            vcode_repo.create_or_update_code(db, None, email, vcode_type, code, now + timedelta(seconds=ttl_seconds), sent)
+            db.commit()
+        except IntegrityError:
+            # 期间已经发送了新的验证码
+            db.rollback()
+        finally:
+            db.close()
+
+    async def issue(self, email, vcode_type, code, ttl_seconds, min_interval):
+        return await run_in_threadpool(self._issue, email, vcode_type, code, ttl_seconds, min_interval)
+
+    async def check(self, email, vcode_type, code):
+        return await run_in_threadpool(self._check, email, vcode_type, code)
+
+    async def consume(self, email, vcode_type, code):
+        return await run_in_threadpool(self._consume, email, vcode_type, code)
+
+    async def restore(self, email, vcode_type, code, ttl_seconds):
+        await run_in_threadpool(self._restore, email, vcode_type, code, ttl_seconds)
+
+    @staticmethod
+    def purge_expired() -> int:
+        db = SessionLocal()
+        try:
+            # 保留最小发送间隔内的行，间隔判断仍然需要 last_send_at
+            before = datetime.utcnow() - timedelta(seconds=settings.VERIFICATION_CODE_MIN_INTERVAL_SECONDS)
+            purged = vcode_repo.purge_expired(db, before)
+            db.commit()
+            return purged
+        finally:
+            db.close()
+
+
+_store: VerificationCodeStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_vcode_store() -> VerificationCodeStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = settings.VERIFICATION_CODE_BACKEND
+                if backend == "redis":
+                    client = get_redis()
+                    if client is None:
+                        raise RuntimeError("VERIFICATION_CODE_BACKEND=redis 需要配置 REDIS_URL")
+                    _store = RedisCodeStore(client)
+                elif backend == "memory":
+                    _store = MemoryCodeStore()
+                else:
+                    _store = SqlCodeStore()
+    return _store
@@ -0,0 +1,23 @@
+import hashlib
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in (t.removeprefix("W/") for t in tags)
+
+
+def body_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+def conditional_response(request: Request, body: bytes, etag: str, cache_control: str,
+                         media_type: str = "application/json") -> Response:
+    """带 ETag 的已序列化响应；If-None-Match 命中时返回 304。"""
+    headers = {"etag": etag, "cache-control": cache_control}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
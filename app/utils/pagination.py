@@ -0,0 +1,42 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import Select, and_, or_
+
+
+def encode_cursor(created_at: datetime, key: int) -> str:
+    raw = json.dumps({"t": created_at.isoformat(), "k": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["t"]), int(data["k"])
+    except Exception as e:
+        raise ValueError("无效的分页游标") from e
+
+
+def keyset_page(stmt: Select, created_col, key_col, page: int, page_size: int, cursor: Optional[str]) -> Select:
+    """
+    按 (createdAt DESC, 主键 DESC) 排序取一页，多取一条用于判断是否还有下一页。
+    传入 cursor 时走 keyset 定位，否则退回 page 的 OFFSET（兼容旧调用）。
+    """
+    stmt = stmt.order_by(created_col.desc(), key_col.desc())
+    if cursor:
+        created_at, key = decode_cursor(cursor)
+        stmt = stmt.where(or_(created_col < created_at, and_(created_col == created_at, key_col < key)))
+    else:
+        stmt = stmt.offset((page - 1) * page_size)
+    return stmt.limit(page_size + 1)
+
+
+def split_page(rows: List[Any], page_size: int, created_attr: str, key_attr: str) -> Tuple[List[Any], Optional[str]]:
+    if len(rows) <= page_size:
+        return rows, None
+    items = rows[:page_size]
+    last = items[-1]
+    return items, encode_cursor(getattr(last, created_attr), getattr(last, key_attr))
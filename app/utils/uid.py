@@ -1,25 +1,110 @@
 import hashlib
-import os
-import random
-import time
+import hmac
+import threading
+from collections import deque
+from typing import Callable, Deque, List
+
 from sqlalchemy.orm import Session
-from app.models import User
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.repository import sequence_repo, user_repo
+
+UID_MIN = 100_000
+UID_MAX = 999_999
+UID_SPACE = UID_MAX - UID_MIN + 1  # 900000
+
+SEQUENCE_NAME = "uid"
+
+# 20 位 Feistel 网络（2^20 >= 900000），超出范围的结果做 cycle walking
+_HALF_BITS = 10
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+
+
+class UidPermutation:
+    """
+    [0, UID_SPACE) 上由密钥决定的双射：连续的序号映射为看起来随机、互不重复的 6 位 UID。
+    """
+
+    def __init__(self, key: bytes):
+        # 轮函数只依赖 (轮次, 10 位右半部分)，预先算成查找表
+        self._tables = [
+            [
+                int.from_bytes(hmac.new(key, bytes([i]) + r.to_bytes(2, "big"), hashlib.sha256).digest()[:4], "big")
+                & _HALF_MASK
+                for r in range(1 << _HALF_BITS)
+            ]
+            for i in range(_ROUNDS)
+        ]
+
+    def _feistel(self, x: int) -> int:
+        left, right = x >> _HALF_BITS, x & _HALF_MASK
+        for table in self._tables:
+            left, right = right, left ^ table[right]
+        return (left << _HALF_BITS) | right
+
+    def __call__(self, n: int) -> int:
+        if not 0 <= n < UID_SPACE:
+            raise ValueError("序号超出 UID 空间")
+        x = self._feistel(n)
+        while x >= UID_SPACE:
+            x = self._feistel(x)
+        return UID_MIN + x
+
+
+class UidAllocator:
+    """
+    进程内 UID 分配器：从数据库序列按块预留序号，经置换得到 UID。
+    序列保证跨 worker 不重复、置换是双射，因此新 UID 之间不会冲突；
+    旧版随机生成的 UID 在每块预留时用一次 IN 查询过滤掉。
+    """
+
+    def __init__(self, permutation: UidPermutation, block_size: int,
+                 session_factory: Callable[[], Session] = SessionLocal):
+        self.permutation = permutation
+        self.block_size = max(1, block_size)
+        self.session_factory = session_factory
+        self._pending: Deque[int] = deque()
+        self._lock = threading.Lock()
+
+    def allocate(self) -> int:
+        with self._lock:
+            while not self._pending:
+                self._pending.extend(self._reserve())
+            return self._pending.popleft()
+
+    def _reserve(self) -> List[int]:
+        db = self.session_factory()
+        try:
+            start = sequence_repo.reserve_block(db, SEQUENCE_NAME, self.block_size)
+            db.commit()
+            if start >= UID_SPACE:
+                raise RuntimeError("UID 已耗尽")
+            candidates = [self.permutation(n) for n in range(start, min(start + self.block_size, UID_SPACE))]
+            taken = user_repo.existing_uids(db, candidates)
+            return [uid for uid in candidates if uid not in taken]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
 
 
-def generate_uid(db: Session, datetime: int, secret_salt: str | None = None) -> int:
-    secret_salt = secret_salt or os.getenv("SECRET_SALT", "default_salt")
+_allocator: UidAllocator | None = None
+_allocator_lock = threading.Lock()
 
-    for attempt in range(100):
-        nonce = f"{time.time_ns()}-{random.randint(0, 999999)}"
-        raw_str = f"{secret_salt}-{datetime}-{nonce}"
-        hash_val = hashlib.sha256(raw_str.encode()).hexdigest()
 
-        uid_int = int(hash_val[:16], 16) % 1_000_000
+def _get_allocator() -> UidAllocator:
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                key = (settings.UID_PERMUTATION_KEY or settings.SECURITY_KEY).encode()
+                _allocator = UidAllocator(UidPermutation(key), settings.UID_BLOCK_SIZE)
+    return _allocator
 
-        # 检查数据库
-        if uid_int > 100_000:
-            exists = db.query(User).filter(User.uid == uid_int).first()
-            if not exists:
-                return uid_int
 
-    raise RuntimeError("无法生成唯一 UID（重试次数过多）")
+def generate_uid() -> int:
+    """分配一个新的 6 位 UID；平均每 UID_BLOCK_SIZE 次调用才访问一次数据库。"""
+    return _get_allocator().allocate()
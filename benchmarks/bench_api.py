@@ -0,0 +1,272 @@
+"""
+接口压测：先用 benchmarks.seed 生成数据集，再分别经 httpx ASGITransport（进程内）和真实的 uvicorn 端口
+压测主要接口，输出每个接口的 p50/p95/p99 与吞吐，并把结果写成 JSON 便于前后对比。
+
+    python -m benchmarks.bench_api --users 1000 --requests 300 --concurrency 16
+    python -m benchmarks.bench_api --transport asgi --compare benchmarks/results/api-20261001-120000.json
+
+默认在临时目录中使用 SQLite 与独立的 UPLOAD_DIR；传 --database-url 可指向一个空的 MySQL 库。
+压测时关闭限流、邮件队列和缩略图，避免测到的是这些旁路而不是接口本身。
+--compare 时任一接口 p95 变慢超过 --regression-threshold 则以退出码 1 结束。
+默认输出目录 benchmarks/results/ 不纳入版本控制，需要作为基线的结果请另存。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+os.environ.setdefault("SECURITY_KEY", "bench-" + "x" * 32)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# 1x1 PNG；每次上传在末尾追加随机字节，避免全部命中同一个 Blob
+_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+def _configure_env(args, workdir: str):
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("UPLOAD_DIR", os.path.join(workdir, "uploads"))
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "none")
+    os.environ.setdefault("MAIL_QUEUE_ENABLED", "false")
+    os.environ.setdefault("THUMBNAIL_ENABLED", "false")
+
+
+def _percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def _summarize(latencies, errors: int, wall: float) -> dict:
+    samples = sorted(latencies)
+    ms = lambda s: round(s * 1000, 3)  # noqa: E731
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "p50_ms": ms(_percentile(samples, 0.50)),
+        "p95_ms": ms(_percentile(samples, 0.95)),
+        "p99_ms": ms(_percentile(samples, 0.99)),
+        "mean_ms": ms(statistics.fmean(samples)),
+        "rps": round(len(samples) / wall, 1) if wall > 0 else None,
+    }
+
+
+async def _run(client, make_request, n: int, concurrency: int) -> dict:
+    """concurrency 个协程共同完成 n 次请求；非 2xx/304 计为错误。"""
+    latencies, errors = [], 0
+    remaining = n
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            method, url, kwargs = make_request()
+            t = time.perf_counter()
+            r = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - t)
+            if not (200 <= r.status_code < 300 or r.status_code == 304):
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return _summarize(latencies, errors, time.perf_counter() - t0)
+
+
+async def _login(client, username: str, password: str) -> dict:
+    r = await client.post("/auth/login", json={"username": username, "password": password})
+    r.raise_for_status()
+    return {"Authorization": "Bearer " + r.json()["data"]["access_token"]}
+
+
+async def _scenarios(client, data: dict, args):
+    """返回 [(名称, 请求数, 生成请求的函数)]；令牌与 ETag 在这里预先准备好。"""
+    password = data["password"]
+    admin = await _login(client, data["admin"], password)
+    applicants = [await _login(client, u, password) for u in data["registered_usernames"][:args.sessions]]
+    etags = []
+    for headers in applicants:
+        r = await client.get("/registration/status", headers=headers)
+        etags.append({**headers, "If-None-Match": r.headers.get("etag", "")})
+
+    def login():
+        return "POST", "/auth/login", {"json": {"username": random.choice(data["usernames"]), "password": password}}
+
+    def registration_status():
+        return "GET", "/registration/status", {"headers": random.choice(applicants)}
+
+    def registration_status_304():
+        return "GET", "/registration/status", {"headers": random.choice(etags)}
+
+    def project_detail():
+        return "GET", f"/project/{random.choice(data['project_ids'])}", {}
+
+    def upload_image():
+        body = _PNG + os.urandom(64)
+        return "POST", "/upload/image?context=project", {
+            "headers": random.choice(applicants), "files": {"file": ("bench.png", body, "image/png")},
+        }
+
+    def admin_list(path):
+        def make():
+            return "GET", f"{path}?page={random.randint(1, 5)}", {"headers": admin}
+        return make
+
+    return [
+        ("auth_login", args.login_requests, login),
+        ("registration_status", args.requests, registration_status),
+        ("registration_status_304", args.requests, registration_status_304),
+        ("project_detail", args.requests, project_detail),
+        ("upload_image", args.requests, upload_image),
+        ("admin_registrations", args.requests, admin_list("/admin/registrations")),
+        ("admin_users", args.requests, admin_list("/admin/users")),
+        ("admin_projects", args.requests, admin_list("/admin/projects")),
+    ]
+
+
+async def _bench(client, data: dict, args) -> dict:
+    results = {}
+    for name, n, make_request in await _scenarios(client, data, args):
+        if args.only and name not in args.only:
+            continue
+        await _run(client, make_request, min(n, args.concurrency * 2), args.concurrency)  # 预热
+        results[name] = await _run(client, make_request, n, args.concurrency)
+        r = results[name]
+        print(f"  {name:<26} p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}  p99 {r['p99_ms']:8.2f} ms"
+              f"  {r['rps']:8.1f} req/s  errors {r['errors']}")
+    return results
+
+
+async def bench_asgi(data: dict, args) -> dict:
+    import httpx
+    from app.main import app
+
+    # httpx 的 ASGITransport 不触发 lifespan，手动执行 startup/shutdown
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await _bench(client, data, args)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def bench_uvicorn(data: dict, args) -> dict:
+    import httpx
+    import uvicorn
+    from app.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn 启动失败")
+        await asyncio.sleep(0.05)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as client:
+            return await _bench(client, data, args)
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(current: dict, baseline_path: str, threshold: float) -> bool:
+    """逐接口对比 p95，返回是否存在超过阈值的退化。"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressed = False
+    print(f"\ncompare with {baseline_path} ({baseline.get('meta', {}).get('commit')}):")
+    for transport, scenarios in current["results"].items():
+        for name, r in scenarios.items():
+            old = baseline.get("results", {}).get(transport, {}).get(name)
+            if not old or not old.get("p95_ms"):
+                continue
+            change = (r["p95_ms"] - old["p95_ms"]) / old["p95_ms"]
+            flag = ""
+            if change > threshold:
+                flag, regressed = "  REGRESSION", True
+            print(f"  {transport:<8} {name:<26} p95 {old['p95_ms']:8.2f} -> {r['p95_ms']:8.2f} ms ({change:+.0%}){flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    from benchmarks import seed as seed_module
+    seed_module.add_arguments(parser)
+    parser.add_argument("--database-url", help="默认使用临时 SQLite；MySQL 请使用空库")
+    parser.add_argument("--transport", choices=("asgi", "uvicorn", "both"), default="both")
+    parser.add_argument("--requests", type=int, default=300, help="每个接口的请求数")
+    parser.add_argument("--login-requests", type=int, default=50, help="登录含 bcrypt，单独设置请求数")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sessions", type=int, default=32, help="参与轮询/上传的已报名用户数")
+    parser.add_argument("--only", nargs="*", help="只压测指定接口（名称见输出）")
+    parser.add_argument("--output", help="结果 JSON 路径，默认 benchmarks/results/api-<时间>.json")
+    parser.add_argument("--compare", help="与之前的结果 JSON 对比 p95")
+    parser.add_argument("--regression-threshold", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory(prefix="bench-api-") as workdir:
+        _configure_env(args, workdir)
+        print("seeding ...")
+        data = seed_module.seed(args.users, args.registrations, args.projects, args.attachments)
+        print(f"seeded {data['counts']} in {data['seconds']}s")
+
+        results = {}
+        if args.transport in ("asgi", "both"):
+            print("asgi (httpx ASGITransport, in-process):")
+            results["asgi"] = asyncio.run(bench_asgi(data, args))
+        if args.transport in ("uvicorn", "both"):
+            print("uvicorn (real socket):")
+            results["uvicorn"] = asyncio.run(bench_uvicorn(data, args))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "database": (args.database_url or "sqlite").split("://", 1)[0],
+            "dataset": data["counts"],
+            "requests": args.requests,
+            "login_requests": args.login_requests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"api-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nresults written to {output}")
+
+    if args.compare and compare(report, args.compare, args.regression_threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
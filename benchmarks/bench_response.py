@@ -0,0 +1,84 @@
+"""
+响应序列化微基准：100 个 ProjectOut（各含 5 个 AttachmentOut）放进 {code, message, data} 信封。
+
+    python -m benchmarks.bench_response --items 100 --repeat 200
+
+legacy:   model_dump() -> FastAPI jsonable_encoder -> JSONResponse(json.dumps)
+envelope: 模型直接交给 EnvelopeResponse（pydantic-core to_json）
+"""
+import argparse
+import os
+import statistics
+import time
+from datetime import datetime
+
+os.environ.setdefault("SECURITY_KEY", "bench-" + "x" * 32)
+
+
+def _projects(n: int):
+    from app.schemas import ProjectOut
+    from app.schemas.attachment_schema import AttachmentOut
+
+    now = datetime.utcnow()
+    return [
+        ProjectOut(
+            projectId=i, uid=100000 + i, title=f"project {i}", description="d" * 200,
+            repoUrl="https://example.com/repo", demoUrl=None, createdAt=now, updatedAt=now,
+            attachments=[
+                AttachmentOut(
+                    id=i * 10 + j, url=f"https://example.com/static/blobs/{i}/{j}.png",
+                    originalFilename=f"{j}.png", mimeType="image/png", etag='"abc"',
+                    thumbnailUrl=None, width=640, height=480, createdAt=now,
+                )
+                for j in range(5)
+            ],
+        )
+        for i in range(n)
+    ]
+
+
+def legacy(projects) -> bytes:
+    from fastapi.encoders import jsonable_encoder
+    from starlette.responses import JSONResponse
+
+    payload = {"code": 0, "message": "OK", "data": {"items": [p.model_dump() for p in projects]}}
+    return JSONResponse(content=jsonable_encoder(payload)).body
+
+
+def envelope(projects) -> bytes:
+    from app.core.response import ok
+
+    return ok({"items": projects}).body
+
+
+def _measure(fn, projects, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(projects)
+        samples.append((time.perf_counter() - t) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    projects = _projects(args.items)
+    import json
+    assert json.loads(legacy(projects)) == json.loads(envelope(projects)), "两条路径输出不一致"
+
+    results = {}
+    for name, fn in (("legacy", legacy), ("envelope", envelope)):
+        fn(projects)  # 预热
+        results[name] = _measure(fn, projects, args.repeat)
+        p50, p95 = results[name]
+        print(f"{name:<10} p50 {p50:8.3f} ms   p95 {p95:8.3f} ms   ({len(fn(projects))} bytes)")
+    print(f"speedup (p50): {results['legacy'][0] / results['envelope'][0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+UID 分配基准：在已有 N 个（旧版随机 UID）用户的库上，对比逐次探测的旧算法与按块预留的新分配器。
+
+    python -m benchmarks.bench_uid --users 100000 500000 800000 --allocations 2000
+
+默认使用临时 SQLite 库；传 --database-url 可以指向一个空的 MySQL 库（会清空其中的 users 表）。
+旧算法不写入用户，distinct 小于分配次数即并发注册时会撞上的重复 UID。
+"""
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("SECURITY_KEY", "bench-" + "x" * 32)
+
+
+def legacy_generate_uid(db, User, ts: int, secret_salt: str = "your_salt_here") -> int:
+    # 旧版 app/utils/uid.py：每次尝试都查询一次 users 表
+    for _ in range(100):
+        nonce = f"{time.time_ns()}-{random.randint(0, 999999)}"
+        raw_str = f"{secret_salt}-{ts}-{nonce}"
+        uid_int = int(hashlib.sha256(raw_str.encode()).hexdigest()[:16], 16) % 1_000_000
+        if uid_int > 100_000:
+            if not db.query(User).filter(User.uid == uid_int).first():
+                return uid_int
+    raise RuntimeError("无法生成唯一 UID（重试次数过多）")
+
+
+def _percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def _seed(engine, User, n_users: int):
+    from sqlalchemy import insert, delete
+    from app.models import IdSequence
+    from app.utils.uid import UID_MIN, UID_MAX
+
+    with engine.begin() as conn:
+        conn.execute(delete(User))
+        conn.execute(delete(IdSequence))
+    uids = random.sample(range(UID_MIN, UID_MAX + 1), n_users)
+    now = __import__("datetime").datetime.utcnow()
+    with engine.begin() as conn:
+        for i in range(0, n_users, 10_000):
+            conn.execute(insert(User), [
+                {"uid": uid, "username": f"u{uid}", "email": f"u{uid}@bench.local", "passwordHash": "x",
+                 "isAdmin": False, "createdAt": now, "updatedAt": now}
+                for uid in uids[i:i + 10_000]
+            ])
+
+
+def _run(label, allocate, n, queries):
+    latencies, issued = [], set()
+    start_queries = queries[0]
+    t0 = time.perf_counter()
+    for _ in range(n):
+        t = time.perf_counter()
+        uid = allocate()
+        latencies.append((time.perf_counter() - t) * 1e6)
+        issued.add(uid)
+    elapsed = time.perf_counter() - t0
+    print(f"  {label:<10} {n / elapsed:>10.0f}/s  p50 {_percentile(latencies, .5):>8.1f}us  "
+          f"p99 {_percentile(latencies, .99):>9.1f}us  queries/uid {(queries[0] - start_queries) / n:>6.2f}  "
+          f"distinct {len(issued)}/{n}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[100_000, 500_000, 800_000])
+    parser.add_argument("--allocations", type=int, default=2000)
+    parser.add_argument("--block-size", type=int, default=64)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+    # 不沿用环境中的 DATABASE_URL，避免误清空业务库
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='bench_uid_')}/bench.db"
+
+    from sqlalchemy import event
+    from app.db.session import Base, engine, SessionLocal
+    from app.models import User
+    from app.utils.uid import UidAllocator, UidPermutation
+
+    Base.metadata.create_all(bind=engine)
+    queries = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_):
+        queries[0] += 1
+
+    for n_users in args.users:
+        print(f"existing users: {n_users}")
+        _seed(engine, User, n_users)
+        db = SessionLocal()
+        try:
+            _run("legacy", lambda: legacy_generate_uid(db, User, int(time.time())), args.allocations, queries)
+        finally:
+            db.close()
+        allocator = UidAllocator(UidPermutation(os.urandom(16)), args.block_size)
+        _run("allocator", allocator.allocate, args.allocations, queries)
+
+
+if __name__ == "__main__":
+    main()